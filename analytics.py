@@ -0,0 +1,161 @@
+"""Cross-metric analytics over every region and year, computed once per data version.
+
+EYS, school counts, student-to-school ratios and the population aged 16-18
+are joined on (region, year) once. Students are estimated as ratio times
+schools per level; divided by the population aged 16-18 they give a gross
+enrollment ratio, which can exceed 1 as pupils of other ages count too.
+Pairwise correlations and outlier scores are then computed on the resulting
+matrix with NumPy, for all metrics, regions and years in one pass, instead
+of chart by chart.
+"""
+import hashlib
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data
+import regions
+import tables
+
+LEVELS = ['sma', 'smk', 'slb']
+
+# Metric columns of the joined table, in the order of the correlation matrix
+METRICS = ['hls', *[f'rasio_peserta_{level}' for level in LEVELS], *[f'jumlah_{level}' for level in LEVELS],
+           'penduduk_16_18', 'siswa_estimasi', 'enrollment_rate']
+
+LABELS = {
+    'hls': 'EYS',
+    'rasio_peserta_sma': 'Students per SMA',
+    'rasio_peserta_smk': 'Students per SMK',
+    'rasio_peserta_slb': 'Students per SLB',
+    'jumlah_sma': 'SMA schools',
+    'jumlah_smk': 'SMK schools',
+    'jumlah_slb': 'SLB schools',
+    'penduduk_16_18': 'Population aged 16-18',
+    'siswa_estimasi': 'Estimated students',
+    'enrollment_rate': 'Gross enrollment ratio (est.)',
+}
+
+# A region-year whose largest within-year z-score exceeds this is an outlier
+OUTLIER_Z = 2.0
+
+_SOURCES = ('hls', 'peserta_per_sekolah', 'jmlh_sekolah', 'penduduk_by_usia')
+
+_lock = threading.Lock()
+# (version, joined table, correlation matrix, z-scores)
+_cache = None
+
+
+def token():
+    """Changes whenever one of the joined sources or the region dimension is reloaded."""
+    tokens = ''.join(data.token(source) for source in _SOURCES) + regions.version()
+    return hashlib.sha256(tokens.encode()).hexdigest()
+
+
+def _keyed(df):
+    # Every source joins on the shared region categories
+    return df.assign(daerah=regions.encode(df['daerah'].astype(str)))
+
+
+def _join():
+    hls = tables.metric_table('hls', 'hls').rename(columns={'region': 'daerah', 'year': 'tahun', 'value': 'hls'})
+    ratios = data.load('peserta_per_sekolah')[['daerah', 'tahun', *[f'rasio_peserta_{level}' for level in LEVELS]]]
+    schools = data.load('jmlh_sekolah')[['daerah', 'tahun', *[f'jumlah_{level}' for level in LEVELS]]]
+    population = data.load('penduduk_by_usia')[['daerah', 'tahun', '16-18 tahun']]
+    population = population.rename(columns={'16-18 tahun': 'penduduk_16_18'})
+
+    joined = _keyed(hls)
+    for df in (ratios, schools, population):
+        joined = joined.merge(_keyed(df), on=['daerah', 'tahun'], how='inner', validate='one_to_one')
+    return joined.sort_values(['tahun', 'daerah']).reset_index(drop=True)
+
+
+def _analyse(joined):
+    """Add the derived columns to `joined`; returns it with the correlation and z-score matrices."""
+    ratios = joined[[f'rasio_peserta_{level}' for level in LEVELS]].to_numpy(dtype='float64')
+    schools = joined[[f'jumlah_{level}' for level in LEVELS]].to_numpy(dtype='float64')
+    population = joined['penduduk_16_18'].to_numpy(dtype='float64')
+    # Students per school times schools, summed over the levels
+    students = np.nansum(ratios * schools, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.where(population > 0, students / population, np.nan)
+    joined['siswa_estimasi'] = students.round()
+    joined['enrollment_rate'] = rate
+
+    values = joined[METRICS].to_numpy(dtype='float64')
+
+    # Pearson correlations over the region-years with every metric present
+    complete = values[np.isfinite(values).all(axis=1)]
+    centered = complete - complete.mean(axis=0)
+    scale = np.sqrt((centered ** 2).sum(axis=0))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        correlation = (centered.T @ centered) / np.outer(scale, scale)
+
+    # z-scores within each year, so a nationwide trend does not make a year an outlier
+    years, year_index = np.unique(joined['tahun'].to_numpy(), return_inverse=True)
+    present = np.isfinite(values)
+    filled = np.where(present, values, 0.0)
+    counts = np.zeros((len(years), len(METRICS)))
+    sums = np.zeros((len(years), len(METRICS)))
+    squares = np.zeros((len(years), len(METRICS)))
+    np.add.at(counts, year_index, present)
+    np.add.at(sums, year_index, filled)
+    np.add.at(squares, year_index, filled ** 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = sums / counts
+        std = np.sqrt(squares / counts - mean ** 2)
+        z = (values - mean[year_index]) / std[year_index]
+    z[~np.isfinite(z)] = np.nan
+
+    magnitude = np.nan_to_num(np.abs(z), nan=-1.0)
+    worst = magnitude.argmax(axis=1)
+    joined['outlier_score'] = magnitude[np.arange(len(joined)), worst].clip(min=0)
+    joined['outlier_metric'] = pd.Categorical(np.asarray(METRICS)[worst], categories=METRICS)
+    return joined, correlation, z
+
+
+def _entry():
+    global _cache
+    current = token()
+    with _lock:
+        if _cache is not None and _cache[0] == current:
+            return _cache
+        joined, correlation, z = _analyse(_join())
+        _cache = (current, joined, correlation, z)
+        return _cache
+
+
+def table():
+    """One row per (region, year) with every metric, the estimates and the outlier score."""
+    return _entry()[1].copy(deep=False)
+
+
+def correlations():
+    """Metric x metric Pearson correlation matrix."""
+    return pd.DataFrame(_entry()[2], index=METRICS, columns=METRICS)
+
+
+def zscores():
+    """(region, year) x metric z-scores, each relative to its year."""
+    _, joined, _, z = _entry()
+    return pd.DataFrame(z, index=pd.MultiIndex.from_frame(joined[['daerah', 'tahun']]), columns=METRICS)
+
+
+def outliers(threshold=OUTLIER_Z):
+    """Region-years whose outlier score is above `threshold`, most extreme first."""
+    joined = _entry()[1]
+    rows = joined[joined['outlier_score'] > threshold]
+    return rows.sort_values('outlier_score', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def cached():
+    """The joined table currently held, if any."""
+    with _lock:
+        return _cache[1] if _cache is not None else None
+
+
+def clear():
+    global _cache
+    with _lock:
+        _cache = None
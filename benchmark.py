@@ -0,0 +1,298 @@
+"""Headless rerun benchmarks for app.py.
+
+    python benchmark.py [--scales 1,10,100,1000] [--baseline FILE] [--save-baseline] [--max-values N]
+
+The report is driven through Streamlit's AppTest. For every data scale the
+caches are cleared and each section is opened once (cold), then rerun for
+every value of each of its sliders in turn (warm); the sliders sit in
+separate fragments, so their combinations add nothing. Wall time and peak
+Python allocations are recorded per section, and every figure is compared
+with the stored baseline: the run fails when one exceeds it by more than the
+tolerance, or when there is no baseline to compare with. Scales above 1 run against synthetic data with that many times
+the regions and, up to 10x, the years of the shipped CSVs.
+
+Startup is measured in fresh interpreters: the imports app.py needs, then
+loading every source one after another, on the loader threads, and from
+binary snapshots where a source is not in the store.
+"""
+import argparse
+import logging
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from streamlit.testing.v1 import AppTest
+
+import analytics
+import charts
+import data
+import ranking
+import regions
+import tables
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+# Setting widget state between AppTest runs warns about the missing script context
+logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').disabled = True
+
+
+def clear_caches():
+    data.clear()
+    regions.clear()
+    tables.clear()
+    ranking.clear()
+    analytics.clear()
+    charts.clear()
+
+
+def use_data_dir(path):
+    data.DATA_DIR = path
+    data.STORE_DIR = os.path.join(path, 'store')
+    data.SNAPSHOT_DIR = os.path.join(path, 'snapshot')
+    clear_caches()
+
+
+def _format_id_number(values):
+    # Inverse of normalize.parse_id_number for whole numbers
+    return [f'{int(v):,}'.replace(',', '.') for v in values]
+
+
+def synthesize(source_dir, target_dir, scale, seed=0):
+    """Write the sources scaled to `scale` times the regions and min(scale, 10) times the years."""
+    rng = np.random.default_rng(seed)
+    year_factor = min(scale, 10)
+
+    for name, filename in data.SOURCES.items():
+        schema = data.SCHEMAS.get(name, {})
+        df = pd.read_csv(os.path.join(source_dir, filename))
+        region = 'provinsi' if 'provinsi' in df.columns else 'daerah'
+        tiled = pd.concat([df] * scale, ignore_index=True)
+        tiled[region] = [f'{value} {i}' if i else value for i in range(scale) for value in df[region]]
+
+        if 'tahun' in df.columns:
+            years = sorted(df['tahun'].unique())
+            tiled = pd.concat([
+                tiled[tiled['tahun'] == year].assign(tahun=year + k * len(years))
+                for k in range(year_factor) for year in years
+            ], ignore_index=True)
+        else:
+            # Wide `metric_YYYY` columns get new years appended as columns
+            wide = [c for c in df.columns if c.rsplit('_', 1)[-1].isdigit()]
+            for k in range(1, year_factor):
+                for column in wide:
+                    prefix, year = column.rsplit('_', 1)
+                    tiled[f'{prefix}_{int(year) + k * len(wide)}'] = tiled[column]
+
+        for column in tiled.columns:
+            if column in (region, 'tahun') or not pd.api.types.is_numeric_dtype(tiled[column]):
+                continue
+            kind = schema.get(column, schema.get('*'))
+            values = tiled[column].to_numpy(dtype='float64')
+            if kind == 'id_int':
+                # The shipped file stores thousands as a float, e.g. 1.882 for 1882
+                values = values * 1000
+            noisy = values * rng.uniform(0.9, 1.1, size=len(values))
+            if kind in ('int', 'id_int'):
+                noisy = noisy.round()
+            else:
+                noisy = noisy.round(2)
+            if kind == 'id_int':
+                tiled[column] = _format_id_number(noisy)
+            elif kind == 'int':
+                tiled[column] = pd.array(noisy, dtype='Int64')
+            else:
+                tiled[column] = noisy
+        tiled.to_csv(os.path.join(target_dir, filename), index=False)
+
+
+# Run in a fresh interpreter by bench_startup; prints its timings as JSON
+_STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import streamlit, charts, data, diagnostics, instrument, ranking, regions, tables
+timings = {'import': time.perf_counter() - start}
+data.SNAPSHOT_DIR = sys.argv[1]
+mode = sys.argv[2]
+start = time.perf_counter()
+if mode == 'load_sequential':
+    data.SNAPSHOT_DIR = ''
+    for name in data.SOURCES:
+        data.load(name)
+else:
+    if mode == 'load_parallel':
+        data.SNAPSHOT_DIR = ''
+    data.preload()
+timings[mode] = time.perf_counter() - start
+print(json.dumps(timings))
+"""
+
+
+def bench_startup(data_dir, repeat=3):
+    """Median import and source load times of fresh processes reading `data_dir`."""
+    env = {**os.environ, 'DASHBOARD_DATA_DIR': data_dir}
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        data.SNAPSHOT_DIR = snapshot_dir
+        for name in data.SOURCES:
+            if not data.stored(name):
+                data.write_snapshot(name)
+        data.SNAPSHOT_DIR = os.path.join(data_dir, 'snapshot')
+
+        runs = {}
+        for mode in ('load_sequential', 'load_parallel', 'load_snapshot'):
+            for _ in range(repeat):
+                out = subprocess.run([sys.executable, '-c', _STARTUP_PROBE, snapshot_dir, mode],
+                                     cwd=os.path.dirname(APP), env=env, capture_output=True, text=True, check=True)
+                for key, value in json.loads(out.stdout).items():
+                    runs.setdefault(key, []).append(value)
+    return {key: statistics.median(values) for key, values in runs.items()}
+
+
+def _sections(at):
+    return [tab.label for tab in at.tabs]
+
+
+def _timed_run(at):
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(at.exception[0].value)
+    return elapsed
+
+
+def _peak_alloc(at):
+    tracemalloc.start()
+    try:
+        at.run()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _sliders(at):
+    # (element kind, index, years) of every year slider; years with gaps get a select slider
+    found = [('slider', i, list(range(int(s.min), int(s.max) + 1))) for i, s in enumerate(at.slider)]
+    found += [('select_slider', i, [int(option) for option in s.options]) for i, s in enumerate(at.select_slider)]
+    return found
+
+
+def _spread(values, limit):
+    """At most `limit` of `values`, evenly spaced and including both ends."""
+    if not limit or len(values) <= limit:
+        return values
+    picks = np.linspace(0, len(values) - 1, limit).round().astype(int)
+    return [values[i] for i in sorted(set(picks))]
+
+
+def bench_scale(max_values=None, timeout=600):
+    """Startup, cold start plus per-section cold/warm timings for the current data."""
+    startup = bench_startup(data.DATA_DIR)
+    clear_caches()
+    at = AppTest.from_file(APP, default_timeout=timeout)
+    result = {'startup': startup, 'cold_start': _timed_run(at), 'sections': {}}
+
+    for section in _sections(at):
+        at.session_state['section'] = section
+        cold = _timed_run(at)
+        warm = []
+        for kind, index, values in _sliders(at):
+            for value in _spread(values, max_values):
+                getattr(at, kind)[index].set_value(value)
+                warm.append(_timed_run(at))
+        if not warm:
+            warm.append(_timed_run(at))
+
+        result['sections'][section] = {
+            'cold': cold,
+            'warm_mean': statistics.fmean(warm),
+            'warm_max': max(warm),
+            'reruns': len(warm),
+            'alloc_peak': _peak_alloc(at),
+        }
+    return result
+
+
+def flatten(results):
+    figures = {}
+    for scale, result in results.items():
+        figures[f'{scale}x/cold_start'] = result['cold_start']
+        for key, value in result['startup'].items():
+            figures[f'{scale}x/startup/{key}'] = value
+        for section, stats in result['sections'].items():
+            for key in ('cold', 'warm_mean', 'warm_max', 'alloc_peak'):
+                figures[f'{scale}x/{section}/{key}'] = stats[key]
+    return figures
+
+
+def regressions(figures, baseline, tolerance, slack):
+    """Figures exceeding the baseline by more than `tolerance`, ignoring timing noise below `slack` seconds."""
+    failed = []
+    for key, value in figures.items():
+        if key not in baseline:
+            continue
+        limit = baseline[key] * (1 + tolerance)
+        if not key.endswith('alloc_peak'):
+            limit = max(limit, baseline[key] + slack)
+        if value > limit:
+            failed.append((key, baseline[key], value))
+    return failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='1', help='comma-separated data scales (default: %(default)s)')
+    parser.add_argument('--baseline', default=BASELINE, help='baseline file (default: %(default)s)')
+    parser.add_argument('--save-baseline', action='store_true', help='store this run as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative regression (default: %(default)s)')
+    parser.add_argument('--slack', type=float, default=0.005, help='timing noise ignored, in seconds (default: %(default)s)')
+    parser.add_argument('--max-values', type=int, help='cap the values tried per slider, spread over its range')
+    args = parser.parse_args(argv)
+
+    source_dir = data.DATA_DIR
+    results = {}
+    for scale in [int(s) for s in args.scales.split(',')]:
+        with tempfile.TemporaryDirectory() as tmp:
+            if scale == 1:
+                use_data_dir(source_dir)
+            else:
+                synthesize(source_dir, tmp, scale)
+                use_data_dir(tmp)
+            results[scale] = bench_scale(args.max_values)
+        use_data_dir(source_dir)
+
+        result = results[scale]
+        print(f'{scale}x: cold start {result["cold_start"] * 1000:.1f} ms')
+        print('  startup  ' + '  '.join(f'{key} {value * 1000:.1f} ms' for key, value in result['startup'].items()))
+        for section, stats in result['sections'].items():
+            print(f'  {section:<16} cold {stats["cold"] * 1000:8.1f} ms  '
+                  f'warm {stats["warm_mean"] * 1000:8.1f} ms (max {stats["warm_max"] * 1000:.1f}, '
+                  f'{stats["reruns"]} reruns)  peak alloc {stats["alloc_peak"] / 1024:.0f} KiB')
+
+    figures = flatten(results)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(figures, f, indent=2, sort_keys=True)
+        print(f'baseline saved to {args.baseline}')
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f'no baseline at {args.baseline}, run with --save-baseline to create one')
+        return 1
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    failed = regressions(figures, baseline, args.tolerance, args.slack)
+    for key, before, after in failed:
+        print(f'REGRESSION {key}: {before:.4g} -> {after:.4g}')
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
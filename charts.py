@@ -0,0 +1,349 @@
+"""Vega-Lite specs for the report's charts, memoized once serialized.
+
+A spec is keyed by its parameters, e.g. (dataset, metric, year, highlighted
+regions) for the region bar charts, plus the version of the source it was
+built from, so revisiting a slider position skips both the pandas slicing
+and the Altair validation/serialization.
+
+Filtering, top-N and aggregation all happen here, server-side: a spec only
+carries the rows that are drawn, and its wire size is recorded with it.
+"""
+import functools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import analytics
+import data
+import instrument
+import regions
+import tables
+
+# Presentation of each (dataset, metric) bar chart
+STYLES = {
+    ('hls_indo', 'hls'): {
+        'label': 'EYS', 'region': 'Province', 'title': 'Top 10 Provinces by EYS in {year}',
+        'top': 10, 'horizontal': True,
+    },
+    ('hls', 'hls'): {
+        'label': 'EYS', 'title': 'Expected Years of Schooling in {year}',
+        'axis': {'tickMinStep': 0.1},
+    },
+    ('peserta_per_sekolah', 'rasio_peserta_sma'): {
+        'label': 'Student per School (SMA)', 'title': 'Student to School Ratio (SMA) in {year}',
+        'domain': [0, 1200],
+    },
+    ('peserta_per_sekolah', 'rasio_peserta_smk'): {
+        'label': 'Student per School (SMK)', 'title': 'Student to School Ratio (SMK) in {year}',
+        'domain': [0, 1200],
+    },
+    ('peserta_per_sekolah', 'rasio_peserta_slb'): {
+        'label': 'Student per School (SLB)', 'title': 'Student to School Ratio (SLB) in {year}',
+        'domain': [0, 1200],
+    },
+    ('penduduk_by_usia', '16-18 tahun'): {
+        'label': 'Population of Highschool Age', 'title': 'Population of Highschool Age in {year}',
+    },
+}
+
+# Altair is imported by the functions that build charts, not here: it is the
+# slowest import of a cold start and no chart is needed before a section opens.
+
+# 0 turns spec memoization off, e.g. to measure what it saves under load
+SPEC_CACHE_SIZE = int(os.environ.get('DASHBOARD_SPEC_CACHE_SIZE', 256))
+
+# Line colors of the EYS growth chart, top 3 regions first
+GROWTH_COLORS = ('yellow', 'orange', 'red', 'green', 'blue', 'purple')
+
+
+def to_arrow(df):
+    """Serialize `df` the way Streamlit ships chart data to the browser."""
+    # A categorical's dictionary would otherwise ship every region, drawn or not
+    df = df.apply(lambda column: column.cat.remove_unused_categories()
+                  if isinstance(column.dtype, pd.CategoricalDtype) else column)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def bar_chart(df, style, year, highlight):
+    """Altair bar chart of (region, year, value) rows.
+
+    With `year` set, `df` holds that year only. With `year` None, `df` holds
+    every year and the year is picked with a slider bound to a Vega-Lite
+    param, so moving it filters in the browser without a server rerun.
+    """
+    import altair as alt
+
+    label = style['label']
+    region = style.get('region', 'Region')
+    df = df.rename(columns={'region': 'Region', 'year': 'Year', 'value': label})
+    if year is not None and 'top' in style:
+        df = df.nlargest(style['top'], label)
+
+    value_axis = alt.Axis(title=label, **style.get('axis', {}))
+    value_scale = alt.Scale(domain=style['domain']) if 'domain' in style else alt.Undefined
+    value = alt.X if style.get('horizontal') else alt.Y
+    category = alt.Y if style.get('horizontal') else alt.X
+    sort = '-x' if style.get('horizontal') else '-y'
+
+    encoding = {
+        'x' if style.get('horizontal') else 'y': value(f'{label}:Q', axis=value_axis, scale=value_scale),
+        'y' if style.get('horizontal') else 'x': category('Region:N', sort=sort, axis=alt.Axis(title=region)),
+    }
+    chart = alt.Chart(df).mark_bar().encode(
+        tooltip=['Region:N', f'{label}:Q', 'Year:O'],
+        color=alt.condition(
+            alt.FieldOneOfPredicate(field='Region', oneOf=list(highlight)),
+            alt.value('orange'),
+            alt.value('steelblue')
+        ),
+        **encoding
+    ).properties(
+        width=600,
+        height=400,
+    )
+
+    if year is not None:
+        return chart.properties(title=style['title'].format(year=year))
+
+    years = sorted(df['Year'].unique().tolist())
+    # Like the server-side slider, years with gaps get a picker offering only the stored years
+    if years == list(range(years[0], years[-1] + 1)):
+        bind = alt.binding_range(min=years[0], max=years[-1], step=1, name='Year ')
+    else:
+        bind = alt.binding_select(options=years, name='Year ')
+    selected = alt.param(name='year', value=years[0], bind=bind)
+    chart = chart.add_params(selected).transform_filter(alt.datum.Year == selected)
+    if 'top' in style:
+        chart = chart.transform_window(
+            window=[alt.WindowFieldDef(op='row_number', **{'as': 'rank'})],
+            sort=[alt.SortField(label, order='descending')],
+        ).transform_filter(alt.datum.rank <= style['top'])
+    prefix, _, suffix = style['title'].partition('{year}')
+    title = f"'{prefix}' + year" + (f" + '{suffix}'" if suffix else '')
+    return chart.properties(title=alt.TitleParams(text=alt.ExprRef(expr=title)))
+
+
+def serialize(altair_chart, **fields):
+    """Spec of `altair_chart` with its data attached as Arrow bytes.
+
+    The chart data is referenced by name and shipped pre-serialized, so a
+    cached spec carries bytes Streamlit can forward without converting again.
+    The full wire size is kept in the spec's `usermeta`.
+    """
+    import altair as alt
+
+    with instrument.stage('serialize', **fields) as info:
+        frame, altair_chart.data = altair_chart.data, alt.NamedData(name='values')
+        spec = altair_chart.to_dict()
+        # Drop the default theme's view size, Streamlit renders without a theme config
+        spec.pop('config', None)
+        values = to_arrow(frame)
+        spec['usermeta'] = {'rows': len(frame), 'payload_bytes': len(json.dumps(spec)) + len(values)}
+        spec['datasets'] = {'values': values}
+        info.update(spec['usermeta'])
+    return spec
+
+
+@functools.lru_cache(maxsize=SPEC_CACHE_SIZE)
+def _spec(dataset, metric, year, highlight, version):
+    with instrument.stage('filter', dataset=dataset, metric=metric, year=year) as info:
+        if year is None:
+            df = tables.metric_table(dataset, metric)
+        else:
+            df = tables.year_slice(dataset, metric, year).assign(year=year)
+        info['rows'] = len(df)
+    with instrument.stage('chart', dataset=dataset, metric=metric, year=year):
+        chart = bar_chart(df, STYLES[(dataset, metric)], year, highlight)
+    return serialize(chart, dataset=dataset, metric=metric, year=year)
+
+
+def bar_spec(dataset, metric, year, highlight=()):
+    """Serialized Vega-Lite spec of the `metric` bar chart for `year`.
+
+    A `year` of None embeds every year with an in-chart year slider.
+
+    Pass the result to `st.vega_lite_chart`; it is shared between sessions
+    and must not be modified.
+    """
+    return _spec(dataset, metric, year, tuple(sorted(highlight)), tables.token(dataset))
+
+
+_PLURALS = {'city': 'Cities', 'regency': 'Regencies', 'mixed': 'Regions'}
+
+
+def growth_title(top, bottom):
+    """'Top 3 Cities and Bottom 3 Regencies', following the kinds of the regions in `top` and `bottom`."""
+    return (f'Top {len(top)} {_PLURALS[regions.kind(top)]} '
+            f'and Bottom {len(bottom)} {_PLURALS[regions.kind(bottom)]}')
+
+
+@functools.lru_cache(maxsize=SPEC_CACHE_SIZE)
+def _growth_spec(colors, title, version):
+    import altair as alt
+
+    with instrument.stage('filter', dataset='hls', metric='hls') as info:
+        df = tables.series('hls', 'hls', [region for region, _ in colors])
+        df = df.rename(columns={'region': 'daerah', 'year': 'Year', 'value': 'EYS'})
+        info['rows'] = len(df)
+    with instrument.stage('chart', chart='eys_growth'):
+        # Axes and title span the stored years and values, whatever years are loaded
+        years = tables.years('hls', 'hls')
+        low, high = float(np.floor(df['EYS'].min())), float(np.ceil(df['EYS'].max()))
+        chart = alt.Chart(df).mark_line().encode(
+            x=alt.X('Year:O', scale=alt.Scale(domain=years)),
+            y=alt.Y('EYS:Q', scale=alt.Scale(domain=[low, high])),
+            color=alt.Color('daerah:N', scale=alt.Scale(domain=[region for region, _ in colors],
+                                                      range=[color for _, color in colors]))
+        ).properties(
+            width=100,
+            height=400,
+            title=f'EYS Growth for {title} ({years[0]}-{years[-1]})'
+        )
+    return serialize(chart, chart='eys_growth')
+
+
+def growth_spec(colors, title):
+    """Line chart of the EYS of the regions in `colors`, a region -> color mapping, titled after `title`."""
+    return _growth_spec(tuple(colors.items()), title, tables.token('hls'))
+
+
+def college_shares(column):
+    """Share of each region in `column` of the college counts, with its pie slice precomputed.
+
+    Regions without a college draw nothing and are left out of the payload.
+    """
+    df = data.load('jmlh_pt_aceh')
+    counts = df[column].fillna(0)
+    share = counts * 100 / counts.sum()
+    end = share.cumsum() * (2 * np.pi / 100)
+    shares = pd.DataFrame({
+        'Province': df['daerah'].astype(str),
+        f'% {column}': share,
+        'start': end - share * (2 * np.pi / 100),
+        'end': end,
+    })
+    return shares[counts > 0].reset_index(drop=True)
+
+
+@functools.lru_cache(maxsize=SPEC_CACHE_SIZE)
+def _share_spec(column, title, version):
+    import altair as alt
+
+    with instrument.stage('filter', dataset='jmlh_pt_aceh', metric=column) as info:
+        df = college_shares(column)
+        # Keep one color per region across pies, including regions not drawn
+        domain = data.load('jmlh_pt_aceh')['daerah'].astype(str).tolist()
+        info['rows'] = len(df)
+    with instrument.stage('chart', chart=f'colleges_{column}'):
+        chart = alt.Chart(df).mark_arc().encode(
+            # Slices are laid out server-side, so the angles are used as-is
+            theta=alt.Theta('start:Q', scale=None),
+            theta2='end:Q',
+            color=alt.Color('Province:N', scale=alt.Scale(scheme='category20', domain=domain)),
+            tooltip=['Province:N', alt.Tooltip(f'% {column}:Q', format='.2f')],
+        ).properties(
+            title=title
+        )
+    return serialize(chart, chart=f'colleges_{column}')
+
+
+def share_spec(column, title):
+    """Pie chart of each region's share of the `column` college count."""
+    return _share_spec(column, title, data.token('jmlh_pt_aceh'))
+
+
+@functools.lru_cache(maxsize=SPEC_CACHE_SIZE)
+def _correlation_spec(version):
+    import altair as alt
+
+    with instrument.stage('filter', dataset='analytics', metric='correlation') as info:
+        matrix = analytics.correlations().rename(index=analytics.LABELS, columns=analytics.LABELS)
+        df = matrix.rename_axis(index='Metric').reset_index().melt(
+            id_vars='Metric', var_name='Against', value_name='r')
+        df['r'] = df['r'].round(2)
+        order = list(matrix.index)
+        info['rows'] = len(df)
+    with instrument.stage('chart', chart='correlations'):
+        base = alt.Chart(df).encode(
+            x=alt.X('Against:N', sort=order, axis=alt.Axis(title=None, labelAngle=-45)),
+            y=alt.Y('Metric:N', sort=order, axis=alt.Axis(title=None)),
+        )
+        cells = base.mark_rect().encode(
+            color=alt.Color('r:Q', scale=alt.Scale(scheme='redblue', domain=[-1, 1]), title='r'),
+            tooltip=['Metric:N', 'Against:N', 'r:Q'],
+        )
+        text = base.mark_text(fontSize=10).encode(text=alt.Text('r:Q', format='.2f'))
+        chart = (cells + text).properties(
+            width=500,
+            height=500,
+            title='Correlation Between Metrics Across Regions and Years'
+        )
+    return serialize(chart, chart='correlations')
+
+
+def correlation_spec():
+    """Heatmap of the pairwise correlations of every analytics metric."""
+    return _correlation_spec(analytics.token())
+
+
+@functools.lru_cache(maxsize=SPEC_CACHE_SIZE)
+def _scatter_spec(x, y, highlight, version):
+    import altair as alt
+
+    with instrument.stage('filter', dataset='analytics', metric=f'{x}/{y}') as info:
+        df = analytics.table()[['daerah', 'tahun', x, y, 'outlier_score']]
+        df = df.rename(columns={'daerah': 'Region', 'tahun': 'Year', x: analytics.LABELS[x], y: analytics.LABELS[y],
+                                'outlier_score': 'Outlier score'})
+        df['Outlier'] = df['Outlier score'] > analytics.OUTLIER_Z
+        info['rows'] = len(df)
+    with instrument.stage('chart', chart='scatter'):
+        chart = alt.Chart(df).mark_circle(size=80).encode(
+            x=alt.X(f'{analytics.LABELS[x]}:Q', scale=alt.Scale(zero=False)),
+            y=alt.Y(f'{analytics.LABELS[y]}:Q', scale=alt.Scale(zero=False)),
+            color=alt.condition(
+                alt.FieldOneOfPredicate(field='Region', oneOf=list(highlight)),
+                alt.value('orange'),
+                alt.value('steelblue')
+            ),
+            shape=alt.Shape('Outlier:N', legend=alt.Legend(title='Outlier')),
+            tooltip=['Region:N', 'Year:O', f'{analytics.LABELS[x]}:Q', f'{analytics.LABELS[y]}:Q',
+                     alt.Tooltip('Outlier score:Q', format='.2f')],
+        ).properties(
+            width=600,
+            height=400,
+            title=f'{analytics.LABELS[y]} vs. {analytics.LABELS[x]}'
+        )
+    return serialize(chart, chart='scatter')
+
+
+def scatter_spec(x, y, highlight=()):
+    """Scatter plot of analytics metric `y` against `x`, one point per region and year."""
+    return _scatter_spec(x, y, tuple(sorted(highlight)), analytics.token())
+
+
+def payload_bytes(spec):
+    """Bytes sent to the browser for `spec`, chart data included."""
+    return spec.get('usermeta', {}).get('payload_bytes', 0)
+
+
+_CACHED = (_spec, _growth_spec, _share_spec, _correlation_spec, _scatter_spec)
+
+
+def cache_info():
+    """Hit/miss statistics of the spec caches combined."""
+    infos = [cached.cache_info() for cached in _CACHED]
+    return infos[0]._replace(**{
+        field: sum(getattr(info, field) for info in infos) for field in ('hits', 'misses', 'maxsize', 'currsize')
+    })
+
+
+def clear():
+    for cached in _CACHED:
+        cached.cache_clear()
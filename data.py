@@ -0,0 +1,237 @@
+"""Process-wide access to the CSV sources behind the dashboard.
+
+Streamlit re-executes app.py on every interaction, but imported modules stay
+alive for the lifetime of the server process. Each source is therefore parsed
+once and kept here until the file on disk changes.
+
+Sources are read under a lock of their own, so several can be loaded at once
+on the thread pool behind `preload`.
+
+A source kept in the store (see etl.py) is read from there. Otherwise its CSV
+is read from an up-to-date binary snapshot (see `write_snapshot`) when there
+is one and parsed when there is not, so snapshots only matter for the
+sources the store does not hold.
+"""
+import concurrent.futures
+import contextvars
+import hashlib
+import json
+import os
+import threading
+
+import pandas as pd
+
+import instrument
+import normalize
+import store
+
+# Frames handed out by load() share their buffers with the cached original.
+# With copy-on-write (always on from pandas 3) any write to such a frame copies
+# first, so one session can never corrupt the data another session sees.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# Overridable so benchmarks and load tests can point the app at other data
+DATA_DIR = os.environ.get('DASHBOARD_DATA_DIR', os.path.dirname(os.path.abspath(__file__)))
+
+# Tables derived by etl.py; when present they take precedence over the CSVs
+STORE_DIR = os.path.join(DATA_DIR, 'store')
+
+# Parsed CSVs in Arrow IPC form, named after the CSV, schema and parser they came from
+SNAPSHOT_DIR = os.path.join(DATA_DIR, 'snapshot')
+
+LOAD_WORKERS = 4
+
+SOURCES = {
+    'jmlh_sekolah': 'df_jmlh_sekolah.csv',
+    'jmlh_peserta_didik': 'df_jmlh_peserta_didik.csv',
+    'peserta_per_sekolah': 'df_peserta_per_sekolah.csv',
+    'hls': 'df_hls.csv',
+    'penduduk_by_usia': 'df_penduduk_by_usia.csv',
+    'jmlh_pt_aceh': 'df_jmlh_pt_aceh.csv',
+    'hls_indo': 'df_hls_indo.csv',
+}
+
+_AGE_GROUPS = ['3-6 tahun', '7-12 tahun', '13-15 tahun', '16-18 tahun']
+
+# Column kinds per source, see normalize.parse_column. Unlisted columns take the
+# '*' kind when given and stay text otherwise.
+# Region names repeat across rows and tables, so they are stored as categoricals.
+SCHEMAS = {
+    'jmlh_sekolah': {'daerah': 'category', 'tahun': 'int', 'jumlah_slb': 'int', 'jumlah_sma': 'int', 'jumlah_smk': 'int'},
+    'jmlh_peserta_didik': {'daerah': 'category', 'tahun': 'int', 'total_sma': 'int', 'total_smk': 'int', 'total_slb': 'int'},
+    'peserta_per_sekolah': {'daerah': 'category', 'tahun': 'int', 'rasio_peserta_slb': 'float', 'rasio_peserta_sma': 'float',
+                            'rasio_peserta_smk': 'float'},
+    # Wide CSVs carry one `hls_YYYY` column per year; the store keeps them tall with `tahun`
+    'hls': {'daerah': 'category', 'tahun': 'int', '*': 'float'},
+    # Population counts are written with '.' as the thousands separator
+    'penduduk_by_usia': {'daerah': 'category', 'tahun': 'int', **{group: 'id_int' for group in _AGE_GROUPS}},
+    'jmlh_pt_aceh': {'daerah': 'category', 'negeri': 'float', 'swasta': 'float', 'total': 'float'},
+    'hls_indo': {'provinsi': 'category', 'tahun': 'int', '*': 'float'},
+}
+
+_lock = threading.Lock()
+# name -> (path, mtime_ns, size, sha256, frame, parse issues)
+_cache = {}
+# name -> store partitions last read, see store.read_partitions
+_partitions = {}
+# name -> lock held while that source is checked or read
+_source_locks = {}
+
+_pool = concurrent.futures.ThreadPoolExecutor(max_workers=LOAD_WORKERS, thread_name_prefix='data-load')
+
+
+def _digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def stored(name):
+    """Whether source `name` is served from the store rather than from its CSV."""
+    return os.path.exists(store.manifest_path(STORE_DIR, name))
+
+
+def _path(name):
+    # A stored table's manifest is rewritten whenever one of its partitions is,
+    # so its stat and digest stand for the whole table
+    if stored(name):
+        return store.manifest_path(STORE_DIR, name)
+    return os.path.join(DATA_DIR, SOURCES[name])
+
+
+def read_source(name):
+    """Parse the CSV of source `name`, ignoring the store."""
+    return parse_csv(name, os.path.join(DATA_DIR, SOURCES[name]))
+
+
+def parse_csv(name, path):
+    """Parse the CSV at `path` with the schema of source `name`; returns (frame, issues)."""
+    return normalize.apply_schema(pd.read_csv(path, dtype=str), SCHEMAS.get(name, {}))
+
+
+def _snapshot_paths(name, digest):
+    # A changed schema or parser makes the same CSV parse differently
+    key = hashlib.sha256(f'{digest}:{json.dumps(SCHEMAS.get(name, {}), sort_keys=True)}:{normalize.VERSION}'.encode())
+    prefix = os.path.join(SNAPSHOT_DIR, f'{name}-{key.hexdigest()[:16]}')
+    return prefix + '.arrow', prefix + '.issues.arrow'
+
+
+def write_snapshot(name):
+    """Write the parsed CSV of source `name` as a binary snapshot; returns its path.
+
+    The snapshot is only read while `name` is not in the store.
+    """
+    path = os.path.join(DATA_DIR, SOURCES[name])
+    frame, issues = parse_csv(name, path)
+    targets = _snapshot_paths(name, _digest(path))
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    for target, df in zip(targets, (frame, issues)):
+        df.reset_index(drop=True).to_feather(target + '.tmp', compression='uncompressed')
+        os.replace(target + '.tmp', target)
+    return targets[0]
+
+
+def _read(name, path, digest):
+    schema = SCHEMAS.get(name, {})
+    if path.endswith(store.MANIFEST):
+        # Only partitions added or rewritten since the last read come from disk
+        parts = store.read_partitions(STORE_DIR, name, _partitions.get(name))
+        _partitions[name] = parts
+        # Partitions are already typed; only the categoricals are lost on concat
+        frame = pd.concat([part for _, part in parts.values()], ignore_index=True)
+        frame = normalize.restore_categories(frame, schema)
+        issues = store.read_issues(STORE_DIR, name)
+        return frame, issues if issues is not None else normalize.empty_report()
+    snapshot, issues = _snapshot_paths(name, digest)
+    if os.path.exists(snapshot) and os.path.exists(issues):
+        return pd.read_feather(snapshot), pd.read_feather(issues)
+    return parse_csv(name, path)
+
+
+def _source_lock(name):
+    with _lock:
+        return _source_locks.setdefault(name, threading.Lock())
+
+
+def _entry(name):
+    path = _path(name)
+    stat = os.stat(path)
+    lock = _source_lock(name)
+    if not lock.acquire(blocking=False):
+        # Another thread, e.g. the background preload, holds the source; time the wait
+        with instrument.stage('load_wait', source=name):
+            lock.acquire()
+    try:
+        cached = _cache.get(name)
+        if cached is not None and cached[:3] == (path, stat.st_mtime_ns, stat.st_size):
+            return cached
+
+        # The file was touched; only re-parse when its content actually changed.
+        digest = _digest(path)
+        if cached is not None and cached[0] == path and cached[3] == digest:
+            cached = (path, stat.st_mtime_ns, stat.st_size, digest) + cached[4:]
+        else:
+            with instrument.stage('load', source=name) as info:
+                frame, issues = _read(name, path, digest)
+                info['rows'] = len(frame)
+            cached = (path, stat.st_mtime_ns, stat.st_size, digest, frame, issues)
+        with _lock:
+            _cache[name] = cached
+        return cached
+    finally:
+        lock.release()
+
+
+def years(name):
+    """Sorted years of source `name` from its store manifest, or None when it is served from its CSV."""
+    if not stored(name):
+        return None
+    return store.years(STORE_DIR, name)
+
+
+def preload(names=None, wait=True):
+    """Load `names` (default: every source) concurrently on the loader threads.
+
+    With `wait` False this returns at once and the sources keep loading in
+    the background; a later `load` of one still in flight waits for it.
+    """
+    names = list(SOURCES if names is None else names)
+    # Copy the caller's context so load stages are still timed
+    futures = [_pool.submit(contextvars.copy_context().run, _entry, name) for name in names]
+    if wait:
+        for future in futures:
+            future.result()
+
+
+def load(name):
+    """Return the frame for source `name`, reading it only when it changed.
+
+    The result is a copy-on-write view over the shared data, so callers may
+    modify it freely without affecting other sessions.
+    """
+    return _entry(name)[4].copy(deep=False)
+
+
+def issues(name):
+    """(column, row, value) of the cells in source `name` that failed to parse."""
+    return _entry(name)[5].copy(deep=False)
+
+
+def token(name):
+    """Content hash of source `name`, usable as a cache key for derived data."""
+    return _entry(name)[3]
+
+
+def cached():
+    """Frames currently held in the process-wide cache, by source name."""
+    with _lock:
+        return {name: entry[4] for name, entry in _cache.items()}
+
+
+def clear():
+    with _lock:
+        _cache.clear()
+        _partitions.clear()
@@ -0,0 +1,44 @@
+"""Memory accounting for the process-wide caches and the per-session state."""
+import sys
+
+import pandas as pd
+
+import analytics
+import charts
+import data
+import regions
+import tables
+
+
+def frame_bytes(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def value_bytes(value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return sys.getsizeof(value)
+
+
+def memory_report():
+    """Bytes held per cached table, shared by every session of this process."""
+    rows = [('source', name, len(df), frame_bytes(df)) for name, df in data.cached().items()]
+    rows += [
+        ('table', dataset, len(frames[0]), sum(frame_bytes(df) for df in frames))
+        for dataset, frames in tables.cached().items()
+    ]
+    rows.append(('dimension', 'regions', len(regions.dimension()), frame_bytes(regions.dimension())))
+    joined = analytics.cached()
+    if joined is not None:
+        rows.append(('table', 'analytics', len(joined), frame_bytes(joined)))
+    return pd.DataFrame(rows, columns=['kind', 'name', 'rows', 'bytes'])
+
+
+def session_bytes(session_state):
+    """Bytes held by one session's own state, on top of the shared tables."""
+    return sum(value_bytes(session_state[key]) for key in session_state)
+
+
+def spec_cache_summary():
+    info = charts.cache_info()
+    return f'{info.currsize}/{info.maxsize} specs cached, {info.hits} hits, {info.misses} misses'
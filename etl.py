@@ -0,0 +1,227 @@
+"""Derive the dashboard's computed tables from the raw sources.
+
+    python etl.py [--store DIR] [--force] [--snapshot] [--append SOURCE YEAR CSV]
+
+Every yearly source is kept in the columnar store as a time series, one
+partition per year, with wide `metric_YYYY` columns turned into a `tahun`
+column. Student-to-school ratios are computed from the raw student and
+school counts in one vectorized join and stored the same way. A year is only
+rewritten when the fingerprint of its input rows changed, so landing a new
+year's data touches one partition.
+
+--snapshot also writes each parsed CSV the app still reads, i.e. of every
+source not in the app's store, as an Arrow file that is read instead of
+parsing the CSV for as long as the CSV is unchanged.
+
+--append adds one year (or backfills an old one) from a CSV holding that
+year only, with the source's columns and either a `tahun` column or none,
+without touching the source's other years.
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+import data
+import normalize
+import store
+
+LEVELS = ['slb', 'sma', 'smk']
+KEYS = ['daerah', 'tahun']
+
+# Sources with one row per region and year, stored as one partition per year
+SERIES = ['hls', 'hls_indo', 'jmlh_sekolah', 'jmlh_peserta_didik', 'penduduk_by_usia']
+
+
+def to_tall(df, year=None):
+    """Turn wide `metric_YYYY` columns into one row per region and `tahun`.
+
+    Frames that already have `tahun` pass through; frames with neither get
+    `year`.
+    """
+    if 'tahun' in df.columns:
+        return df
+    wide = normalize.wide_columns(df.columns)
+    ids = [column for column in df.columns if column not in wide]
+    if not wide:
+        if year is None:
+            raise ValueError('no tahun column, no metric_YYYY columns and no year given')
+        return df.assign(tahun=year)[ids[:1] + ['tahun'] + ids[1:]]
+
+    long = normalize.melt_years(df).rename(columns={'year': 'tahun'})
+    tall = long.pivot(index=ids + ['tahun'], columns='metric', values='value').reset_index()
+    tall.columns.name = None
+    return tall
+
+
+def _write_years(root, table, frame, force, log, origin=None, issues=None):
+    # Rewrite the partitions of `frame` whose rows changed; other years are left alone.
+    # Rows from the source CSV (no origin) never replace a year stored from elsewhere.
+    manifest = store.read_manifest(root, table)
+    partitions = manifest['partitions']
+    changed = []
+    # The parse issues of the source CSV are kept so data.issues() still reports them
+    rewrite = issues is not None and store.write_issues(root, table, manifest, issues)
+    for year, rows in frame.groupby('tahun'):
+        year = int(year)
+        rows = rows.reset_index(drop=True)
+        inputs = store.fingerprint(rows)
+        entry = partitions.get(str(year))
+        if origin is None and entry is not None and 'origin' in entry and not force:
+            continue
+        if force or entry is None or entry['inputs'] != inputs or entry.get('origin') != origin:
+            store.write_partition(root, table, year, rows)
+            partitions[str(year)] = {'file': store.partition_file(year), 'inputs': inputs, 'rows': len(rows)}
+            if origin is not None:
+                partitions[str(year)]['origin'] = origin
+            changed.append(year)
+            log(f'{table}: wrote {year} ({len(rows)} rows)')
+
+    if changed or rewrite or not os.path.exists(store.manifest_path(root, table)):
+        store.write_manifest(root, table, manifest)
+    else:
+        log(f'{table}: up to date')
+    return changed
+
+
+def sync_series(root, name, force=False, log=print):
+    """Bring the partitions of source `name` in line with its CSV.
+
+    Years present only in the store, and years appended or ingested from
+    other files, are kept unless `force` is set.
+    """
+    frame, issues = data.read_source(name)
+    if len(issues):
+        log(f'{name}: {len(issues)} cells could not be parsed')
+    return _write_years(root, name, to_tall(frame), force, log, issues=issues)
+
+
+def ensure_series(root, name, log=print):
+    """Seed the store with the CSV's years before other years are added to it.
+
+    The store takes precedence over the CSV, so a table holding only the
+    added years would hide the rest.
+    """
+    if not os.path.exists(store.manifest_path(root, name)):
+        sync_series(root, name, log=log)
+
+
+def store_years(root, name, frame, origin, log=print):
+    """Write every year of `frame` to source `name`, marking them as coming from `origin`."""
+    ensure_series(root, name, log=log)
+    return _write_years(root, name, frame, force=False, log=log, origin=origin)
+
+
+def append_year(root, name, year, path, replace=False, log=print):
+    """Store the rows for `year` in the CSV at `path` as a new partition of source `name`."""
+    ensure_series(root, name, log=log)
+    frame, issues = data.parse_csv(name, path)
+    if len(issues):
+        log(f'{name}: {len(issues)} cells in {path} could not be parsed')
+    rows = to_tall(frame, year)
+    rows = rows[rows['tahun'] == year].reset_index(drop=True)
+    if rows.empty:
+        raise ValueError(f'{path} has no rows for {year}')
+    store.append_partition(root, name, year, rows, replace=replace, origin=os.path.abspath(path))
+    log(f'{name}: appended {year} ({len(rows)} rows)')
+
+
+def student_school_ratios(schools, students):
+    """rasio_peserta_<level> = total_<level> / jumlah_<level> per region and year."""
+    joined = students.merge(schools, on=KEYS, how='inner', validate='one_to_one')
+    totals = joined[[f'total_{level}' for level in LEVELS]].to_numpy(dtype='float64')
+    counts = joined[[f'jumlah_{level}' for level in LEVELS]].to_numpy(dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratios = (totals / counts).round(2)
+    ratios[counts <= 0] = np.nan
+    result = joined[KEYS].copy()
+    for i, level in enumerate(LEVELS):
+        result[f'rasio_peserta_{level}'] = ratios[:, i]
+    return result.sort_values(KEYS).reset_index(drop=True)
+
+
+def read_input(root, name):
+    """Source `name` as stored under `root`, or parsed from its CSV when `root` does not hold it."""
+    if not os.path.exists(store.manifest_path(root, name)):
+        return data.read_source(name)[0]
+    return normalize.restore_categories(store.read_table(root, name), data.SCHEMAS.get(name, {}))
+
+
+def build_ratios(root, force=False, log=print):
+    """Refresh the peserta_per_sekolah partitions under `root` whose inputs changed.
+
+    Years with school counts but no student counts, or the other way round,
+    have no ratios and are skipped.
+    """
+    table = 'peserta_per_sekolah'
+    schools = read_input(root, 'jmlh_sekolah')
+    students = read_input(root, 'jmlh_peserta_didik')
+    manifest = store.read_manifest(root, table)
+    partitions = manifest['partitions']
+
+    school_years, student_years = set(schools['tahun']), set(students['tahun'])
+    for year in sorted(school_years ^ student_years):
+        missing = 'jmlh_peserta_didik' if year in school_years else 'jmlh_sekolah'
+        log(f'{table}: skipped {year}, no {missing} rows')
+    years = sorted(school_years & student_years)
+    changed = {}
+    for year in years:
+        inputs = store.fingerprint(schools[schools['tahun'] == year], students[students['tahun'] == year])
+        entry = partitions.get(str(year))
+        if force or entry is None or entry['inputs'] != inputs:
+            changed[year] = inputs
+
+    if changed:
+        # One join across every changed year, then split into partitions
+        years_changed = list(changed)
+        ratios = student_school_ratios(schools[schools['tahun'].isin(years_changed)],
+                                       students[students['tahun'].isin(years_changed)])
+        for year, rows in ratios.groupby('tahun'):
+            store.write_partition(root, table, year, rows)
+            partitions[str(year)] = {'file': store.partition_file(year), 'inputs': changed[year], 'rows': len(rows)}
+            log(f'{table}: wrote {year} ({len(rows)} rows)')
+
+    removed = sorted(set(partitions) - {str(year) for year in years})
+    for key in removed:
+        store.remove_partition(root, table, key)
+        del partitions[key]
+        log(f'{table}: removed {key}')
+
+    if changed or removed or not os.path.exists(store.manifest_path(root, table)):
+        store.write_manifest(root, table, manifest)
+    else:
+        log(f'{table}: up to date')
+    return sorted(changed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--store', default=data.STORE_DIR, help='store directory (default: %(default)s)')
+    parser.add_argument('--force', action='store_true', help='recompute every partition')
+    parser.add_argument('--append', nargs=3, metavar=('SOURCE', 'YEAR', 'CSV'),
+                        help='add YEAR of SOURCE from CSV, then refresh the derived tables')
+    parser.add_argument('--replace', action='store_true', help='let --append overwrite an existing year')
+    parser.add_argument('--snapshot', action='store_true',
+                        help='also write binary snapshots of the parsed CSVs for faster cold starts')
+    args = parser.parse_args(argv)
+    if args.append:
+        name, year, path = args.append
+        if name not in SERIES:
+            parser.error(f'SOURCE must be one of {", ".join(SERIES)}')
+        append_year(args.store, name, int(year), path, replace=args.replace)
+    for name in SERIES:
+        sync_series(args.store, name, force=args.force)
+    build_ratios(args.store, force=args.force)
+    if args.snapshot:
+        # The store takes precedence, so sources it holds would never read a snapshot
+        for name in data.SOURCES:
+            if data.stored(name):
+                print(f'{name}: served from the store, no snapshot')
+            else:
+                print(f'{name}: snapshot {data.write_snapshot(name)}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
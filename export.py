@@ -0,0 +1,214 @@
+"""Render every chart of the report to a static bundle.
+
+    python export.py [--out DIR] [--formats json,html,svg,png] [--jobs N]
+
+The report's charts are fully determined by the sources and the years on
+their sliders, so every variant can be rendered ahead of time: one Vega-Lite
+spec per bar chart and year, the EYS growth chart, the two college pies, the
+cross-metric heatmap and one scatter plot per pair of distinct metrics. Each
+is written as standalone Vega-Lite JSON and an HTML page, plus SVG and PNG
+when vl-convert-python is installed, and `index.html` shows them all with a
+year picker per bar chart and an axes picker for the scatter plots. The
+bundle is plain files, so any static web server can serve it. Variants are
+rendered in a process pool.
+"""
+import argparse
+import concurrent.futures
+import html
+import json
+import os
+import re
+import sys
+
+import altair as alt
+import pyarrow as pa
+
+import analytics
+import charts
+import ranking
+import regions
+import tables
+
+OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'export')
+
+FORMATS = ('json', 'html', 'svg', 'png')
+
+# The bar charts of app.py: (dataset, metric, highlight regions, or None for the cities)
+BAR_CHARTS = [
+    ('hls_indo', 'hls', ['aceh']),
+    ('hls', 'hls', None),
+    ('peserta_per_sekolah', 'rasio_peserta_sma', None),
+    ('peserta_per_sekolah', 'rasio_peserta_smk', None),
+    ('peserta_per_sekolah', 'rasio_peserta_slb', None),
+    ('penduduk_by_usia', '16-18 tahun', None),
+]
+
+# (x, y) axes of the cross-metric scatter plot, app.py's default first
+SCATTER_DEFAULT = ('penduduk_16_18', 'rasio_peserta_sma')
+SCATTER_CHARTS = [SCATTER_DEFAULT] + [
+    (x, y) for x in analytics.METRICS for y in analytics.METRICS if x != y and (x, y) != SCATTER_DEFAULT
+]
+
+SHARE_CHARTS = [
+    ('negeri', 'Percentage of Public Colleges by Region'),
+    ('swasta', 'Percentage of Private Colleges by Region'),
+]
+
+# The renderer versions matching the specs Altair produces
+VEGA_EMBED = '\n'.join(
+    f'<script src="https://cdn.jsdelivr.net/npm/{package}@{version}"></script>'
+    for package, version in (('vega', alt.VEGA_VERSION), ('vega-lite', alt.VEGALITE_VERSION),
+                             ('vega-embed', alt.VEGAEMBED_VERSION))
+)
+
+
+def _slug(*parts):
+    return '-'.join(re.sub(r'[^0-9a-z]+', '_', str(part).lower()).strip('_') for part in parts)
+
+
+def variants():
+    """(name, group, kind, args) of every chart variant the report can show."""
+    cities = tuple(regions.cities())
+    found = []
+    for dataset, metric, highlight in BAR_CHARTS:
+        highlight = tuple(highlight) if highlight is not None else cities
+        group = _slug(dataset, metric)
+        for year in tables.years(dataset, metric):
+            found.append((_slug(dataset, metric, year), group, 'bar', (dataset, metric, year, highlight)))
+
+    top_3 = ranking.overall('hls', 'hls', 3)
+    bottom_3 = ranking.overall('hls', 'hls', 3, end='bottom')
+    colors = tuple(zip(top_3 + bottom_3, charts.GROWTH_COLORS))
+    found.append(('eys_growth', 'eys_growth', 'growth', (colors, charts.growth_title(top_3, bottom_3))))
+
+    for column, title in SHARE_CHARTS:
+        found.append((_slug('colleges', column), _slug('colleges', column), 'share', (column, title)))
+
+    found.append(('correlations', 'correlations', 'correlation', ()))
+    for x, y in SCATTER_CHARTS:
+        found.append((_slug('scatter', x, y), 'scatter', 'scatter', (x, y, cities)))
+    return found
+
+
+def standalone(spec):
+    """`spec` with its Arrow data inlined as JSON rows, renderable outside Streamlit."""
+    spec = dict(spec)
+    spec['datasets'] = {
+        name: pa.ipc.open_stream(values).read_all().to_pylist()
+        for name, values in spec['datasets'].items()
+    }
+    spec.pop('usermeta', None)
+    return spec
+
+
+def _build(kind, args):
+    if kind == 'bar':
+        return charts.bar_spec(*args)
+    if kind == 'growth':
+        return charts.growth_spec(dict(args[0]), args[1])
+    if kind == 'correlation':
+        return charts.correlation_spec()
+    if kind == 'scatter':
+        return charts.scatter_spec(*args)
+    return charts.share_spec(*args)
+
+
+def _page(title, body):
+    return (f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>{html.escape(title)}</title>\n'
+            f'{VEGA_EMBED}\n</head>\n<body>\n{body}\n</body>\n</html>\n')
+
+
+def render(variant, out_dir, formats):
+    """Write `variant` in each of `formats`; returns the paths written."""
+    name, _, kind, args = variant
+    spec = standalone(_build(kind, args))
+    written = []
+
+    def write(extension, content, mode='w'):
+        path = os.path.join(out_dir, 'charts', f'{name}.{extension}')
+        with open(path, mode) as f:
+            f.write(content)
+        written.append(path)
+
+    text = json.dumps(spec, default=str)
+    if 'json' in formats:
+        write('vl.json', text)
+    if 'html' in formats:
+        write('html', _page(name, f'<div id="chart"></div>\n<script>vegaEmbed("#chart", {text});</script>'))
+    if 'svg' in formats or 'png' in formats:
+        try:
+            import vl_convert
+        except ImportError:
+            return written
+        if 'svg' in formats:
+            write('svg', vl_convert.vegalite_to_svg(text))
+        if 'png' in formats:
+            write('png', vl_convert.vegalite_to_png(text), mode='wb')
+    return written
+
+
+def write_index(out_dir, found):
+    """index.html showing every chart, with year pickers for the bar charts and axes pickers for the scatter plots."""
+    groups = {}
+    for name, group, kind, args in found:
+        if kind == 'bar':
+            label = str(args[2])
+        elif kind == 'scatter':
+            label = f'{analytics.LABELS[args[1]]} vs. {analytics.LABELS[args[0]]}'
+        else:
+            label = ''
+        groups.setdefault(group, []).append((name, label))
+
+    blocks = []
+    for group, entries in groups.items():
+        block = f'<h2>{html.escape(group)}</h2>\n'
+        if len(entries) > 1:
+            options = ''.join(f'<option value="{name}">{html.escape(label)}</option>' for name, label in entries)
+            block += f'<select onchange="show(\'{group}\', this.value)">{options}</select>\n'
+        block += f'<div id="{group}"></div>\n<script>show("{group}", "{entries[0][0]}");</script>'
+        blocks.append(block)
+
+    script = ('<script>\nfunction show(id, name) {\n'
+              '  vegaEmbed("#" + id, "charts/" + name + ".vl.json");\n}\n</script>')
+    with open(os.path.join(out_dir, 'index.html'), 'w') as f:
+        f.write(_page('Education in Aceh Throughout Regions', script + '\n' + '\n'.join(blocks)))
+
+
+def export(out_dir, formats=FORMATS, jobs=None, log=print):
+    """Render every variant into `out_dir`; returns the number of files written."""
+    os.makedirs(os.path.join(out_dir, 'charts'), exist_ok=True)
+    found = variants()
+    if {'svg', 'png'} & set(formats):
+        try:
+            import vl_convert  # noqa: F401
+        except ImportError:
+            log('vl-convert-python is not installed, skipping SVG and PNG')
+
+    written = 0
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        renders = [pool.submit(render, variant, out_dir, formats) for variant in found]
+        for future in concurrent.futures.as_completed(renders):
+            written += len(future.result())
+    if 'json' in formats:
+        write_index(out_dir, found)
+        written += 1
+    log(f'{len(found)} charts, {written} files written to {out_dir}')
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', default=OUT_DIR, help='output directory (default: %(default)s)')
+    parser.add_argument('--formats', default=','.join(FORMATS), help='comma-separated formats (default: %(default)s)')
+    parser.add_argument('--jobs', type=int, help='worker processes (default: one per CPU)')
+    args = parser.parse_args(argv)
+    formats = [f for f in args.formats.split(',') if f]
+    unknown = set(formats) - set(FORMATS)
+    if unknown:
+        parser.error(f'unknown formats: {", ".join(sorted(unknown))}')
+    export(args.out, formats, args.jobs)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""Stream raw school-level enrollment extracts into the per-region aggregates.
+
+    python ingest.py EXTRACT.csv [--store DIR] [--chunksize ROWS] [--dry-run]
+    python ingest.py --sample ROWS EXTRACT.csv
+
+An extract has one row per school and year, Dapodik style: the region, the
+year, the school form (SMA, SMK, SLB, ...), the number of students and the
+school id. It is read in chunks and every chunk is reduced to per (region,
+year, level) sums before the next is read, so memory is bounded by the
+chunk size, the number of regions and years, and 8 bytes per distinct
+school, not by the number of rows. The result
+is the `jmlh_sekolah` and `jmlh_peserta_didik` tables the charts use. Their
+years are written to the store, and the student-to-school ratios are
+refreshed from them. Rows per second and peak memory are reported.
+
+Schools are counted as distinct school ids when the extract has the id
+column, and as rows otherwise. Student counts may be Indonesian-formatted
+('1.000' is a thousand); a count that is not a whole number is reported as
+unparsed.
+"""
+import argparse
+import os
+import re
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import data
+import etl
+import normalize
+
+CHUNKSIZE = 200_000
+
+# Raw column names, overridable on the command line
+COLUMNS = {
+    'region': 'kabupaten_kota',
+    'year': 'tahun',
+    'level': 'bentuk_pendidikan',
+    'students': 'peserta_didik',
+    'school': 'npsn',
+}
+
+# School forms of the extract counted under each level, others are skipped
+LEVEL_FORMS = {'SMA': 'sma', 'SMK': 'smk', 'SLB': 'slb', 'SMLB': 'slb', 'SDLB': 'slb', 'SMPLB': 'slb'}
+
+KEYS = ['daerah', 'tahun', 'level']
+
+_REGION_PREFIX = re.compile(r'^(kab\.?|kabupaten|kota)\s+')
+
+
+def normalize_regions(names):
+    """'Kab. Aceh Barat' and 'KOTA BANDA ACEH' become 'aceh barat' and 'banda aceh'."""
+    names = names.str.strip().str.lower().str.replace(r'\s+', ' ', regex=True)
+    return names.str.replace(_REGION_PREFIX, '', regex=True)
+
+
+def _reduce(chunk, columns, count_ids):
+    """Per (region, year, level) student sums and school rows of one chunk, plus its school ids."""
+    level = chunk[columns['level']].str.strip().str.upper().map(LEVEL_FORMS)
+    frame = pd.DataFrame({
+        'daerah': normalize_regions(chunk[columns['region']]).astype('category'),
+        'tahun': pd.to_numeric(chunk[columns['year']], errors='coerce'),
+        'level': level.astype('category'),
+        # Indonesian-formatted counts ('1.000') parse as in the sources; others count as unparsed
+        'students': normalize.parse_column(chunk[columns['students']], 'id_int').astype('float64'),
+    })
+    valid = frame['daerah'].notna() & frame['tahun'].notna() & frame['level'].notna()
+    frame = frame[valid]
+    frame = frame.assign(unparsed=frame['students'].isna())
+    sums = frame.groupby(KEYS, observed=True).agg(
+        students=('students', 'sum'), schools=('students', 'size'), unparsed=('unparsed', 'sum'))
+    # Plain labels, so chunks with different categories align when summed
+    sums = sums.reset_index().astype({'daerah': str, 'level': str}).set_index(KEYS)
+
+    ids = {}
+    if count_ids:
+        # School ids are kept as 64-bit hashes, 8 bytes per distinct school
+        hashes = pd.Series(pd.util.hash_array(chunk[columns['school']][valid].str.strip().to_numpy(dtype=object)),
+                           index=frame.index)
+        ids = {key: np.unique(group.to_numpy()) for key, group in hashes.groupby(
+            [frame[key] for key in KEYS], observed=True)}
+    return sums, ids, int((~valid).sum())
+
+
+def aggregate(path, columns=COLUMNS, chunksize=CHUNKSIZE, log=print):
+    """Reduce the extract at `path` to (schools, students, stats) frames in the jmlh_* layouts."""
+    header = pd.read_csv(path, nrows=0).columns
+    count_ids = columns['school'] in header
+    usecols = [columns[key] for key in ('region', 'year', 'level', 'students')] + ([columns['school']] if count_ids else [])
+    missing = sorted(set(usecols) - set(header))
+    if missing:
+        raise ValueError(f'{path} lacks the columns {", ".join(missing)}')
+
+    totals = None
+    # (region, year, level) -> sorted school id hashes seen so far
+    ids = {}
+    rows = skipped = 0
+    start = time.perf_counter()
+    for chunk in pd.read_csv(path, usecols=usecols, dtype=str, chunksize=chunksize):
+        sums, chunk_ids, chunk_skipped = _reduce(chunk, columns, count_ids)
+        totals = sums if totals is None else totals.add(sums, fill_value=0)
+        for key, hashes in chunk_ids.items():
+            ids[key] = np.union1d(ids[key], hashes) if key in ids else hashes
+        rows += len(chunk)
+        skipped += chunk_skipped
+        elapsed = time.perf_counter() - start
+        log(f'{rows:,} rows, {rows / elapsed:,.0f} rows/s')
+    elapsed = time.perf_counter() - start
+
+    if totals is None:
+        raise ValueError(f'{path} has no rows')
+    if count_ids:
+        # Distinct schools replace the row counts
+        distinct = pd.Series({key: len(hashes) for key, hashes in ids.items()})
+        distinct.index = distinct.index.set_names(KEYS)
+        totals['schools'] = distinct.reindex(totals.index, fill_value=0)
+
+    wide = totals.unstack('level')
+    wide = wide.reindex(columns=pd.MultiIndex.from_product([wide.columns.levels[0], etl.LEVELS]))
+    schools = _layout(wide['schools'], 'jumlah', ['slb', 'sma', 'smk'])
+    students = _layout(wide['students'], 'total', ['sma', 'smk', 'slb'])
+    stats = {
+        'rows': rows,
+        'skipped': skipped,
+        'unparsed_students': int(totals['unparsed'].sum()),
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed else float('inf'),
+        # ru_maxrss is in KiB on Linux
+        'peak_rss': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+    return schools, students, stats
+
+
+def _layout(values, prefix, levels):
+    # One `<prefix>_<level>` column per level in the column order of the shipped CSV
+    frame = values.fillna(0).round().astype('int64')[levels]
+    frame.columns = [f'{prefix}_{level}' for level in levels]
+    frame = frame.reset_index().sort_values(['daerah', 'tahun'], ignore_index=True)
+    frame['daerah'] = frame['daerah'].astype('category')
+    frame['tahun'] = frame['tahun'].astype('int64')
+    return frame
+
+
+def write_sample(path, rows, seed=0, chunksize=CHUNKSIZE):
+    """Write a synthetic extract of `rows` school rows spread over the shipped regions and years."""
+    rng = np.random.default_rng(seed)
+    regions_ = data.load('jmlh_sekolah')['daerah'].astype(str).unique()
+    years = data.load('jmlh_sekolah')['tahun'].unique()
+    forms = np.array(['SMA', 'SMK', 'SLB', 'SMP', 'SD'])
+    with open(path, 'w') as f:
+        for offset in range(0, rows, chunksize):
+            n = min(chunksize, rows - offset)
+            chunk = pd.DataFrame({
+                'npsn': (offset + np.arange(n)).astype(str),
+                'kabupaten_kota': np.char.add(rng.choice(['Kab. ', 'Kota '], n), rng.choice(regions_, n)),
+                'tahun': rng.choice(years, n),
+                'bentuk_pendidikan': rng.choice(forms, n),
+                'peserta_didik': rng.integers(20, 1500, n),
+            })
+            chunk.to_csv(f, index=False, header=offset == 0)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('extract', help='raw extract CSV')
+    parser.add_argument('--store', default=data.STORE_DIR, help='store directory (default: %(default)s)')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE, help='rows per chunk (default: %(default)s)')
+    parser.add_argument('--dry-run', action='store_true', help='aggregate and report without writing')
+    parser.add_argument('--sample', type=int, metavar='ROWS', help='write a synthetic extract of ROWS rows instead')
+    for key, default in COLUMNS.items():
+        parser.add_argument(f'--{key}-col', default=default, help=f'{key} column (default: %(default)s)')
+    args = parser.parse_args(argv)
+
+    if args.sample:
+        write_sample(args.extract, args.sample, chunksize=args.chunksize)
+        print(f'wrote {args.sample:,} rows to {args.extract}')
+        return 0
+
+    columns = {key: getattr(args, f'{key}_col') for key in COLUMNS}
+    # Progress per chunk goes to stderr, the summary to stdout
+    schools, students, stats = aggregate(args.extract, columns, args.chunksize,
+                                         log=lambda line: print(line, file=sys.stderr))
+    print(f'{stats["rows"]:,} rows in {stats["seconds"]:.2f} s ({stats["rows_per_second"]:,.0f} rows/s), '
+          f'peak RSS {stats["peak_rss"] / 2 ** 20:.0f} MiB')
+    if stats['skipped'] or stats['unparsed_students']:
+        print(f'{stats["skipped"]:,} rows without a known region, year or school form skipped, '
+              f'{stats["unparsed_students"]:,} student counts unparsed')
+    print(f'{len(schools)} region-years')
+    if args.dry_run:
+        return 0
+
+    origin = os.path.abspath(args.extract)
+    etl.store_years(args.store, 'jmlh_sekolah', schools, origin)
+    etl.store_years(args.store, 'jmlh_peserta_didik', students, origin)
+    etl.build_ratios(args.store)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
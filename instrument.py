@@ -0,0 +1,128 @@
+"""Opt-in timing of the report's hot path.
+
+Set DASHBOARD_DEBUG=1 or open the app with ?debug=1 to enable it. Each
+section run is timed stage by stage (load, load_wait, reshape, filter,
+chart, serialize, emit); the records of the last run are shown in the sidebar and
+appended to one JSON-lines file per session. Work that outlives the run it
+was started in, like the background preload, is recorded with `background`.
+Disabled, `stage` costs one context variable lookup.
+"""
+import contextlib
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+
+LOG_DIR = os.environ.get('DASHBOARD_LOG_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs'))
+
+_active = contextvars.ContextVar('instrument_recorder', default=None)
+
+
+def enabled(query_params=None):
+    if os.environ.get('DASHBOARD_DEBUG', '') not in ('', '0'):
+        return True
+    return query_params is not None and query_params.get('debug') == '1'
+
+
+class Recorder:
+    """Stage records of one session, streamed to `<log_dir>/<session>.jsonl`."""
+
+    def __init__(self, session=None, log_dir=LOG_DIR):
+        self.session = session or uuid.uuid4().hex
+        self.path = os.path.join(log_dir, f'{self.session}.jsonl')
+        self.runs = 0
+        self.section = None
+        self.last_run = []
+        # Records of background work, written as they arrive
+        self.background = []
+        self._lock = threading.Lock()
+
+    def start(self, section):
+        self.runs += 1
+        self.section = section
+        self.last_run = []
+
+    def _record(self, section, stage, seconds, fields):
+        return {
+            'ts': time.time(),
+            'session': self.session,
+            'run': self.runs,
+            'section': section,
+            'stage': stage,
+            'ms': round(seconds * 1000, 3),
+            **fields,
+        }
+
+    def add(self, stage, seconds, fields):
+        self.last_run.append(self._record(self.section, stage, seconds, fields))
+
+    def write(self, records):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a') as f:
+                for record in records:
+                    f.write(json.dumps(record, default=str) + '\n')
+
+    def flush(self):
+        self.write(self.last_run)
+
+
+class _Background:
+    # Takes a recorder's place for work that may finish after the block that started it
+    def __init__(self, recorder, section):
+        self.recorder = recorder
+        self.section = section
+
+    def add(self, stage, seconds, fields):
+        record = self.recorder._record(self.section, stage, seconds, fields)
+        self.recorder.background.append(record)
+        self.recorder.write([record])
+
+
+@contextlib.contextmanager
+def stage(name, **fields):
+    """Time the enclosed block; callers may add fields such as `rows` to the yielded dict."""
+    recorder = _active.get()
+    if recorder is None:
+        yield fields
+        return
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        recorder.add(name, time.perf_counter() - start, fields)
+
+
+@contextlib.contextmanager
+def run(recorder, section):
+    """Record every stage of one section run with `recorder`, then flush it."""
+    if recorder is None:
+        yield
+        return
+    token = _active.set(recorder)
+    recorder.start(section)
+    try:
+        with stage('section'):
+            yield
+    finally:
+        _active.reset(token)
+        recorder.flush()
+
+
+@contextlib.contextmanager
+def background(recorder, section):
+    """Record the stages of work started in the block, e.g. on other threads, as `section`.
+
+    The work may still run after the block ends, so each record is written
+    as it arrives and kept in `recorder.background`.
+    """
+    if recorder is None:
+        yield
+        return
+    token = _active.set(_Background(recorder, section))
+    try:
+        yield
+    finally:
+        _active.reset(token)
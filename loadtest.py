@@ -0,0 +1,263 @@
+"""Concurrent-session load test of app.py on a local Streamlit server.
+
+    python loadtest.py [--sessions 1,5,10,25] [--cache-sizes 256,0] [--moves 3] [--json FILE]
+
+For every spec cache size a fresh server is started with
+DASHBOARD_SPEC_CACHE_SIZE set to it (0 turns memoization off). At each
+session count that many simulated browsers connect over Streamlit's
+websocket protocol and, like a reader of the report, open Question #1 and
+Question #2 and move each year slider there a few times. Every slider move is
+sent as the fragment rerun a browser would send. Rerun latency percentiles,
+reruns per second and the server's resident memory are reported per session
+count, together with the count at which throughput stops growing.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+# Sections whose sliders a simulated reader moves, in reading order
+SECTIONS = ['Question #1', 'Question #2']
+
+# Throughput gains below this fraction mean the server is saturated
+SATURATION_GAIN = 0.1
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, env=None, timeout=60):
+    """Run app.py under `streamlit run` and wait until it answers health checks."""
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', APP, '--server.headless', 'true',
+         '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+        env={**os.environ, **(env or {})}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=1):
+                return server
+        except OSError:
+            if server.poll() is not None:
+                raise RuntimeError(f'streamlit exited with status {server.returncode}')
+            time.sleep(0.2)
+    server.kill()
+    raise TimeoutError(f'streamlit did not start within {timeout} s')
+
+
+def rss_bytes(pid):
+    """Resident set size of process `pid`, or None where /proc is unavailable."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class Session:
+    """One simulated browser tab, speaking the websocket protocol of the Streamlit frontend."""
+
+    def __init__(self, url, timeout):
+        self.url = url
+        self.timeout = timeout
+        self.ws = None
+        self.tabs = None
+        self.tab_labels = []
+        self.section = None
+        # widget id -> (label, min, max, fragment id) of every slider seen
+        self.sliders = {}
+        self.values = {}
+        self.latencies = []
+        self.errors = 0
+
+    async def __aenter__(self):
+        self.ws = await websockets.connect(self.url, subprotocols=['streamlit'], max_size=None)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.ws.close()
+
+    def _widget_states(self):
+        states = []
+        if self.tabs is not None and self.section is not None:
+            states.append(WidgetState(id=self.tabs, string_value=self.section))
+        for widget, value in self.values.items():
+            state = WidgetState(id=widget)
+            state.double_array_value.data.append(value)
+            states.append(state)
+        return states
+
+    def _observe(self, delta):
+        kind = delta.WhichOneof('type')
+        if kind == 'add_block':
+            block = delta.add_block.WhichOneof('type')
+            if block == 'tab_container':
+                self.tabs = delta.add_block.id
+            elif block == 'tab' and delta.add_block.tab.label not in self.tab_labels:
+                self.tab_labels.append(delta.add_block.tab.label)
+        elif kind == 'new_element':
+            element = delta.new_element.WhichOneof('type')
+            if element == 'slider':
+                slider = delta.new_element.slider
+                self.sliders[slider.id] = (slider.label, int(slider.min), int(slider.max), delta.fragment_id)
+                self.values.setdefault(slider.id, slider.default[0])
+            elif element == 'exception':
+                self.errors += 1
+
+    async def rerun(self, fragment_id=''):
+        """Request one (fragment) rerun and wait for it to finish; returns its latency."""
+        message = BackMsg()
+        message.rerun_script.query_string = ''
+        message.rerun_script.widget_states.widgets.extend(self._widget_states())
+        message.rerun_script.fragment_id = fragment_id
+        start = time.perf_counter()
+        await self.ws.send(message.SerializeToString())
+        try:
+            await asyncio.wait_for(self._until_finished(), self.timeout)
+        except asyncio.TimeoutError:
+            self.errors += 1
+            return None
+        latency = time.perf_counter() - start
+        self.latencies.append(latency)
+        return latency
+
+    async def _until_finished(self):
+        while True:
+            message = ForwardMsg()
+            message.ParseFromString(await self.ws.recv())
+            kind = message.WhichOneof('type')
+            if kind == 'delta':
+                self._observe(message.delta)
+            elif kind == 'script_finished':
+                return message.script_finished
+
+    async def read_report(self, rng, moves):
+        """Open each section and move each of its sliders `moves` times."""
+        await self.rerun()
+        for section in SECTIONS:
+            if section not in self.tab_labels:
+                continue
+            self.section = section
+            seen = set(self.sliders)
+            await self.rerun()
+            for widget in [w for w in self.sliders if w not in seen]:
+                _, low, high, fragment_id = self.sliders[widget]
+                for _ in range(moves):
+                    choices = [year for year in range(low, high + 1) if year != self.values[widget]]
+                    if not choices:
+                        break
+                    self.values[widget] = float(rng.choice(choices))
+                    await self.rerun(fragment_id)
+
+
+async def _level(url, sessions, moves, seed, timeout, pid):
+    rss_peak = rss_bytes(pid) or 0
+    sampling = True
+
+    async def sample():
+        nonlocal rss_peak
+        while sampling:
+            rss_peak = max(rss_peak, rss_bytes(pid) or 0)
+            await asyncio.sleep(0.1)
+
+    async def reader(index):
+        async with Session(url, timeout) as session:
+            await session.read_report(random.Random(seed + index), moves)
+            return session
+
+    sampler = asyncio.create_task(sample())
+    start = time.perf_counter()
+    done = await asyncio.gather(*(reader(i) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    sampling = False
+    await sampler
+
+    latencies = np.array([latency for session in done for latency in session.latencies])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if len(latencies) else (np.nan,) * 3
+    return {
+        'sessions': sessions,
+        'reruns': len(latencies),
+        'errors': sum(session.errors for session in done),
+        'p50': float(p50),
+        'p95': float(p95),
+        'p99': float(p99),
+        'throughput': len(latencies) / elapsed,
+        'rss': rss_bytes(pid),
+        'rss_peak': rss_peak,
+    }
+
+
+def saturation(levels):
+    """First session count whose throughput gains less than SATURATION_GAIN over the previous one."""
+    for before, after in zip(levels, levels[1:]):
+        if after['throughput'] < before['throughput'] * (1 + SATURATION_GAIN):
+            return before['sessions']
+    return None
+
+
+def run(session_counts, cache_size, moves=3, seed=0, timeout=120):
+    """Load levels for each session count against one fresh server."""
+    port = _free_port()
+    server = start_server(port, {'DASHBOARD_SPEC_CACHE_SIZE': str(cache_size)})
+    try:
+        url = f'ws://127.0.0.1:{port}/_stcore/stream'
+        return [asyncio.run(_level(url, n, moves, seed, timeout, server.pid)) for n in session_counts]
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', default='1,5,10,25', help='comma-separated session counts (default: %(default)s)')
+    parser.add_argument('--cache-sizes', default='256,0', help='comma-separated spec cache sizes (default: %(default)s)')
+    parser.add_argument('--moves', type=int, default=3, help='moves per slider per session (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the slider sequences (default: %(default)s)')
+    parser.add_argument('--timeout', type=float, default=120, help='seconds to wait for one rerun (default: %(default)s)')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    session_counts = [int(n) for n in args.sessions.split(',')]
+    results = {}
+    for cache_size in [int(n) for n in args.cache_sizes.split(',')]:
+        levels = run(session_counts, cache_size, args.moves, args.seed, args.timeout)
+        results[cache_size] = levels
+        print(f'spec cache size {cache_size}:')
+        for level in levels:
+            rss = f'{level["rss"] / 2 ** 20:.0f} MiB' if level['rss'] is not None else 'n/a'
+            print(f'  {level["sessions"]:>4} sessions  p50 {level["p50"] * 1000:7.1f} ms  '
+                  f'p95 {level["p95"] * 1000:7.1f} ms  p99 {level["p99"] * 1000:7.1f} ms  '
+                  f'{level["throughput"]:6.1f} reruns/s  rss {rss} (peak {level["rss_peak"] / 2 ** 20:.0f} MiB)'
+                  + (f'  {level["errors"]} errors' if level['errors'] else ''))
+        saturated = saturation(levels)
+        print(f'  saturates at {saturated} sessions' if saturated else '  not saturated at these session counts')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
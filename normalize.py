@@ -0,0 +1,112 @@
+"""Column-wise, vectorized parsing of the raw CSV text into typed columns.
+
+Sources are read as text and converted per column according to a declared
+kind, so a malformed cell shows up as a reported issue instead of being
+silently coerced.
+"""
+import re
+
+import pandas as pd
+
+# Bumped whenever parsing changes the frames or issues it produces, so binary
+# snapshots written by an older parser are not read
+VERSION = 2
+
+# Indonesian formatting: '.' groups thousands and ',' starts the decimals.
+# Tables exported through a float lose the trailing zeros of their last
+# thousands group ('5.24' is 5.240), so a final group of 1-2 digits is padded.
+_ID_NUMBER = (r'^(?P<sign>-?)(?P<head>\d{1,3}(?:\.\d{3})+|\d+)'
+              r'(?:\.(?P<tail>\d{1,2}))?(?:,(?P<frac>\d+))?$')
+
+
+# Wide layouts carry one `<metric>_<YYYY>` column per metric and year
+_WIDE_COLUMN = re.compile(r'^(?P<metric>.+)_(?P<year>\d{4})$')
+
+
+def parse_id_number(raw):
+    """Parse a text column of Indonesian-formatted numbers, NaN where unparseable."""
+    raw = raw.str.strip()
+    # Plain digits read the same either way and skip the regex
+    plain = raw.str.isdigit().fillna(False).astype(bool)
+    values = pd.to_numeric(raw.where(plain), errors='coerce').astype('float64')
+    if plain.all():
+        return values
+    parts = raw[~plain].str.extract(_ID_NUMBER)
+    tail = parts['tail'].str.ljust(3, '0').fillna('')
+    frac = ('.' + parts['frac']).fillna('')
+    digits = parts['sign'] + parts['head'].str.replace('.', '', regex=False) + tail + frac
+    values[~plain] = pd.to_numeric(digits, errors='coerce')
+    return values
+
+
+def _as_int(values):
+    # A fractional value is not an integer count; it becomes NaN and so a reported issue
+    values = values.where(values == values.round())
+    # Keep plain int64 when every cell parsed, nullable Int64 otherwise
+    if values.isna().any():
+        return values.astype('Int64')
+    return values.astype('int64')
+
+
+def parse_column(raw, kind):
+    if kind == 'str':
+        return raw.str.strip()
+    if kind == 'category':
+        return raw.str.strip().astype('category')
+    if kind == 'id_int':
+        return _as_int(parse_id_number(raw))
+    values = pd.to_numeric(raw.str.strip(), errors='coerce')
+    if kind == 'int':
+        return _as_int(values)
+    if kind == 'float':
+        return values.astype('float64')
+    raise ValueError(f'unknown column kind {kind!r}')
+
+
+def empty_report():
+    return pd.DataFrame(columns=['column', 'row', 'value'])
+
+
+def apply_schema(raw, schema):
+    """Convert the text frame `raw` column by column.
+
+    Columns missing from `schema` use its '*' entry, or stay text without one.
+
+    Returns the typed frame and a frame of (column, row, value) for every
+    non-empty cell that could not be parsed.
+    """
+    columns = {}
+    issues = []
+    for name in raw.columns:
+        text = raw[name]
+        kind = schema.get(name, schema.get('*', 'str'))
+        parsed = parse_column(text, kind)
+        columns[name] = parsed
+        if kind not in ('str', 'category'):
+            bad = parsed.isna() & text.notna() & (text.str.strip() != '')
+            if bad.any():
+                issues.append(pd.DataFrame({'column': name, 'row': text.index[bad], 'value': text[bad]}))
+    report = pd.concat(issues, ignore_index=True) if issues else empty_report()
+    return pd.DataFrame(columns, index=raw.index), report
+
+
+def restore_categories(df, schema):
+    """`df` with the 'category' columns of `schema` converted back, e.g. after a concat lost them."""
+    categories = [column for column, kind in schema.items() if kind == 'category' and column in df.columns]
+    return df.astype({column: 'category' for column in categories})
+
+
+def wide_columns(columns):
+    """The `metric_YYYY` columns among `columns`."""
+    return [column for column in columns if _WIDE_COLUMN.match(column)]
+
+
+def melt_years(df):
+    """Long rows of the other columns plus metric, year and value from the `metric_YYYY` columns of `df`."""
+    wide = wide_columns(df.columns)
+    ids = [column for column in df.columns if column not in wide]
+    long = df.melt(id_vars=ids, value_vars=wide, var_name='column', value_name='value')
+    parts = long['column'].str.extract(_WIDE_COLUMN)
+    long['metric'] = parts['metric']
+    long['year'] = parts['year'].astype('int64')
+    return long.drop(columns='column')
@@ -0,0 +1,96 @@
+"""Per-year region rankings, computed once per source version.
+
+Regions are ranked within every year in one vectorized pass and kept as a
+region x year matrix, so top-k/bottom-k orderings, net growth and
+stability scores are lookups instead of per-render sorts.
+Rank 1 is the highest value.
+"""
+import threading
+
+import numpy as np
+
+import tables
+
+_ENDS = ('top', 'bottom')
+
+_lock = threading.Lock()
+# (dataset, metric) -> (version, {end: rank matrix}, value matrix, {end: regions by mean rank},
+#                       {(k, end): stability}, net growth by region)
+_cache = {}
+
+
+def _entry(dataset, metric):
+    current = tables.token(dataset)
+    key = (dataset, metric)
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == current:
+            return cached
+
+        values = tables.metric_table(dataset, metric).pivot_table(
+            index='region', columns='year', values='value', observed=True)
+        ranks = values.rank(ascending=False, method='min')
+        oriented = {'top': ranks, 'bottom': ranks.rank(ascending=False, method='min')}
+        order = {
+            end: matrix.mean(axis=1).sort_values(kind='stable').index.astype(str).tolist()
+            for end, matrix in oriented.items()
+        }
+        # Sum of the year-over-year deltas, so a missing middle year does not hide the change
+        growth = values.diff(axis=1).sum(axis=1, min_count=1)
+        growth.index = growth.index.astype(str)
+        cached = (current, oriented, values, order, {}, growth)
+        _cache[key] = cached
+        return cached
+
+
+def _oriented(dataset, metric, end):
+    if end not in _ENDS:
+        raise ValueError(f"end must be 'top' or 'bottom', not {end!r}")
+    return _entry(dataset, metric)[1][end]
+
+
+def ranks(dataset, metric):
+    """Region x year matrix of ranks."""
+    return _oriented(dataset, metric, 'top').copy(deep=False)
+
+
+def years(dataset, metric):
+    return _oriented(dataset, metric, 'top').columns.tolist()
+
+
+def overall(dataset, metric, k, end='top'):
+    """The k regions with the best (or worst) mean rank across all years."""
+    if end not in _ENDS:
+        raise ValueError(f"end must be 'top' or 'bottom', not {end!r}")
+    return _entry(dataset, metric)[3][end][:k]
+
+
+def growth(dataset, metric, regions):
+    """Net change of `metric` for each of `regions` from its first to its last year, in the given order."""
+    return _entry(dataset, metric)[5].reindex(list(regions))
+
+
+def stability(dataset, metric, k, end='top'):
+    """Mean overlap (Jaccard) of the top-k sets of consecutive years.
+
+    1.0 means the same k regions every year; 0.0 means no region stays.
+    Computed once per k and data version.
+    """
+    matrix = _oriented(dataset, metric, end)
+    scores = _entry(dataset, metric)[4]
+    if (k, end) not in scores:
+        members = (matrix <= k).to_numpy()
+        if members.shape[1] < 2:
+            score = 1.0
+        else:
+            kept = (members[:, 1:] & members[:, :-1]).sum(axis=0)
+            either = (members[:, 1:] | members[:, :-1]).sum(axis=0)
+            score = float(np.mean(kept / np.maximum(either, 1)))
+        with _lock:
+            scores[(k, end)] = score
+    return scores[(k, end)]
+
+
+def clear():
+    with _lock:
+        _cache.clear()
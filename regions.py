@@ -0,0 +1,83 @@
+"""Canonical dimension of the cities and regencies of Aceh.
+
+Every Aceh table stores its region as a categorical over the same sorted
+category list, so a region is a small integer code shared by all tables
+instead of a repeated Python string, and city membership is a column lookup.
+"""
+import hashlib
+import threading
+
+import pandas as pd
+
+import data
+
+CITIES = ('banda aceh', 'langsa', 'subulussalam', 'lhokseumawe', 'sabang')
+
+# Sources keyed by `daerah`, the union of which makes up the dimension
+REGION_SOURCES = ('hls', 'peserta_per_sekolah', 'penduduk_by_usia', 'jmlh_pt_aceh',
+                  'jmlh_sekolah', 'jmlh_peserta_didik')
+
+_lock = threading.Lock()
+# (version, dimension frame, categorical dtype)
+_cache = None
+
+
+def version():
+    """Changes whenever any source contributing regions is reloaded."""
+    missing = [source for source in REGION_SOURCES if source not in data.cached()]
+    if missing:
+        data.preload(missing)
+    tokens = ''.join(data.token(source) for source in REGION_SOURCES)
+    return hashlib.sha256(tokens.encode()).hexdigest()
+
+
+def _entry():
+    global _cache
+    current = version()
+    with _lock:
+        if _cache is not None and _cache[0] == current:
+            return _cache
+
+        names = pd.concat([data.load(source)['daerah'] for source in REGION_SOURCES])
+        dtype = pd.CategoricalDtype(sorted(names.dropna().unique()))
+        dimension = pd.DataFrame({'name': pd.Categorical(dtype.categories, dtype=dtype)})
+        dimension['code'] = dimension['name'].cat.codes
+        dimension['is_city'] = dimension['name'].isin(CITIES)
+        _cache = (current, dimension[['code', 'name', 'is_city']], dtype)
+        return _cache
+
+
+def dimension():
+    """(code, name, is_city) row per region."""
+    return _entry()[1].copy(deep=False)
+
+
+def dtype():
+    """Categorical dtype shared by every region column."""
+    return _entry()[2]
+
+
+def encode(names):
+    """Convert a column of region names to the shared categorical."""
+    return names.astype(dtype())
+
+
+def cities():
+    """Names of the regions flagged as cities."""
+    dim = _entry()[1]
+    return dim.loc[dim['is_city'], 'name'].tolist()
+
+
+def kind(names):
+    """'city' or 'regency' when all of `names` are one kind of region, 'mixed' otherwise."""
+    city = set(cities())
+    flags = {name in city for name in names}
+    if flags == {True}:
+        return 'city'
+    return 'regency' if flags == {False} else 'mixed'
+
+
+def clear():
+    global _cache
+    with _lock:
+        _cache = None
@@ -0,0 +1,141 @@
+"""Columnar, year-partitioned store for tables derived by the ETL pipeline.
+
+Each table is a directory holding one Parquet file per partition and a
+manifest that records, per partition, the fingerprint of the inputs it was
+computed from. The manifest is replaced atomically after the partitions are
+written, so readers never see a half-updated table.
+
+Partitions are keyed by year, so adding a year is one new file plus a
+manifest entry; the manifest doubles as a cheap index of the stored years.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+MANIFEST = 'manifest.json'
+
+# Cells of the source rows that could not be parsed, see normalize.apply_schema
+ISSUES = 'issues.parquet'
+
+
+def table_dir(root, table):
+    return os.path.join(root, table)
+
+
+def manifest_path(root, table):
+    return os.path.join(table_dir(root, table), MANIFEST)
+
+
+def read_manifest(root, table):
+    try:
+        with open(manifest_path(root, table)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'partitions': {}}
+
+
+def write_manifest(root, table, manifest):
+    path = manifest_path(root, table)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + '.tmp', path)
+
+
+def fingerprint(*frames):
+    """Order-independent content hash of one or more frames."""
+    sha = hashlib.sha256()
+    for df in frames:
+        df = df.sort_values(list(df.columns)).reset_index(drop=True)
+        sha.update(','.join(map(str, df.columns)).encode())
+        sha.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return sha.hexdigest()
+
+
+def partition_file(key):
+    return f'{key}.parquet'
+
+
+def write_partition(root, table, key, df):
+    os.makedirs(table_dir(root, table), exist_ok=True)
+    path = os.path.join(table_dir(root, table), partition_file(key))
+    df.to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+
+
+def remove_partition(root, table, key):
+    try:
+        os.remove(os.path.join(table_dir(root, table), partition_file(key)))
+    except FileNotFoundError:
+        pass
+
+
+def write_issues(root, table, manifest, issues):
+    """Keep `issues` next to the partitions of `table`; returns whether they changed.
+
+    The manifest entry is only updated in `manifest`, for the caller to write.
+    """
+    inputs = fingerprint(issues)
+    entry = manifest.get('issues')
+    if entry is not None and entry['inputs'] == inputs:
+        return False
+    os.makedirs(table_dir(root, table), exist_ok=True)
+    path = os.path.join(table_dir(root, table), ISSUES)
+    issues.reset_index(drop=True).astype({'column': str, 'value': str}).to_parquet(path + '.tmp', index=False)
+    os.replace(path + '.tmp', path)
+    manifest['issues'] = {'file': ISSUES, 'inputs': inputs, 'rows': len(issues)}
+    return True
+
+
+def read_issues(root, table):
+    """The issues kept for `table`, or None when it has none on record."""
+    entry = read_manifest(root, table).get('issues')
+    if entry is None:
+        return None
+    return pd.read_parquet(os.path.join(table_dir(root, table), entry['file']))
+
+
+def years(root, table):
+    """Sorted years stored for `table`, read from the manifest alone."""
+    return sorted(int(key) for key in read_manifest(root, table)['partitions'])
+
+
+def append_partition(root, table, key, df, replace=False, origin=None):
+    """Add `df` as partition `key` of `table` without touching the others.
+
+    Refuses to overwrite an existing partition unless `replace` is set.
+    `origin`, e.g. the file the rows came from, is kept in the manifest.
+    """
+    manifest = read_manifest(root, table)
+    if str(key) in manifest['partitions'] and not replace:
+        raise FileExistsError(f'{table} already has a partition {key}')
+    write_partition(root, table, key, df)
+    entry = {'file': partition_file(key), 'inputs': fingerprint(df), 'rows': len(df)}
+    if origin is not None:
+        entry['origin'] = origin
+    manifest['partitions'][str(key)] = entry
+    write_manifest(root, table, manifest)
+
+
+def read_partitions(root, table, previous=None):
+    """{key: (manifest entry, frame)} for every partition of `table`.
+
+    Frames in `previous`, an earlier result, are reused for the partitions
+    whose manifest entry is unchanged, so only new or rewritten partitions
+    are read from disk.
+    """
+    previous = previous or {}
+    parts = {}
+    for key, entry in sorted(read_manifest(root, table)['partitions'].items()):
+        reused = previous.get(key)
+        if reused is not None and reused[0] == entry:
+            parts[key] = reused
+        else:
+            parts[key] = (entry, pd.read_parquet(os.path.join(table_dir(root, table), entry['file'])))
+    return parts
+
+
+def read_table(root, table):
+    """All partitions of `table` concatenated, in partition order."""
+    return pd.concat([frame for _, frame in read_partitions(root, table).values()], ignore_index=True)
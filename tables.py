@@ -0,0 +1,129 @@
+"""Tidy, year-indexed views of the sources, built once per source version.
+
+Every source is reshaped into a long (region, year, metric, value) table and
+split into one slice per (metric, year), so chart code only has to look up the
+slice it needs instead of melting and filtering on every rerun.
+"""
+import threading
+
+import pandas as pd
+
+import data
+import instrument
+import normalize
+import regions
+
+# dataset -> (source, region column, year column or None for wide `metric_YYYY` columns, metrics)
+# Wide sources read from the time-series store are already tall, with a `tahun` column
+DATASETS = {
+    'hls': ('hls', 'daerah', None, ['hls']),
+    'hls_indo': ('hls_indo', 'provinsi', None, ['hls']),
+    'peserta_per_sekolah': ('peserta_per_sekolah', 'daerah', 'tahun',
+                            ['rasio_peserta_sma', 'rasio_peserta_smk', 'rasio_peserta_slb']),
+    'penduduk_by_usia': ('penduduk_by_usia', 'daerah', 'tahun',
+                         ['3-6 tahun', '7-12 tahun', '13-15 tahun', '16-18 tahun']),
+}
+
+_lock = threading.Lock()
+# dataset -> (source token, long table, {(metric, year): slice})
+_cache = {}
+
+
+def _to_long(df, region_col, year_col, metrics):
+    if year_col is None and 'tahun' in df.columns:
+        year_col = 'tahun'
+    if year_col is None:
+        # Wide layout: one `metric_YYYY` column per year
+        long = normalize.melt_years(df)
+        long = long[long['metric'].isin(metrics)]
+    else:
+        long = df.melt(id_vars=[region_col, year_col], value_vars=metrics,
+                       var_name='metric', value_name='value')
+        long = long.rename(columns={year_col: 'year'})
+    long = long.rename(columns={region_col: 'region'})
+    # Aceh regions share the canonical region categories, provinces get their own
+    long['region'] = regions.encode(long['region']) if region_col == 'daerah' else long['region'].astype('category')
+    long['metric'] = long['metric'].astype('category')
+    return long[['region', 'year', 'metric', 'value']].reset_index(drop=True)
+
+
+def _entry(dataset):
+    source, region_col, year_col, metrics = DATASETS[dataset]
+    current = token(dataset)
+    with _lock:
+        cached = _cache.get(dataset)
+        if cached is not None and cached[0] == current:
+            return cached
+
+        df = data.load(source)
+        with instrument.stage('reshape', dataset=dataset) as info:
+            long = _to_long(df, region_col, year_col, metrics)
+            # Slices are kept sorted by value so top-N queries are a head()
+            index = {
+                key: group[['region', 'value']].sort_values('value', ascending=False).reset_index(drop=True)
+                for key, group in long.groupby(['metric', 'year'], observed=True)
+            }
+            info['rows'] = len(long)
+        cached = (current, long, index)
+        _cache[dataset] = cached
+        return cached
+
+
+def token(dataset):
+    """Version of the data behind `dataset`, changes whenever it is reloaded."""
+    source, region_col = DATASETS[dataset][:2]
+    if region_col == 'daerah':
+        return data.token(source) + regions.version()
+    return data.token(source)
+
+
+def long_table(dataset):
+    """Full (region, year, metric, value) table for `dataset`."""
+    return _entry(dataset)[1].copy(deep=False)
+
+
+def year_slice(dataset, metric, year):
+    """(region, value) rows of `metric` in `year`, sorted by value descending."""
+    index = _entry(dataset)[2]
+    try:
+        return index[(metric, year)].copy(deep=False)
+    except KeyError:
+        return pd.DataFrame({'region': pd.Series(dtype=object), 'value': pd.Series(dtype=float)})
+
+
+def metric_table(dataset, metric):
+    """(region, year, value) rows of `metric` across all years."""
+    long = _entry(dataset)[1]
+    rows = long[long['metric'] == metric]
+    return rows[['region', 'year', 'value']].reset_index(drop=True)
+
+
+def series(dataset, metric, regions):
+    """(region, year, value) rows of `metric` for the given regions across all years."""
+    long = _entry(dataset)[1]
+    rows = long[(long['metric'] == metric) & long['region'].isin(regions)]
+    return rows[['region', 'year', 'value']].reset_index(drop=True)
+
+
+def years(dataset, metric):
+    """Sorted years for which `metric` has data.
+
+    For a source in the store these are its stored years, read from the
+    manifest without loading or reshaping the source.
+    """
+    stored = data.years(DATASETS[dataset][0])
+    if stored is not None:
+        return stored
+    index = _entry(dataset)[2]
+    return sorted(year for m, year in index if m == metric)
+
+
+def cached():
+    """Long tables and year slices currently held, by dataset name."""
+    with _lock:
+        return {dataset: [entry[1], *entry[2].values()] for dataset, entry in _cache.items()}
+
+
+def clear():
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,37 @@
+import pandas as pd
+
+import normalize
+
+
+def test_parse_id_number():
+    raw = pd.Series(['2.2', '5.24', '1.234.567', '12', '-3,5', ' 7 ', 'abc', '1.2345'])
+    parsed = normalize.parse_id_number(raw)
+    assert parsed.iloc[:6].tolist() == [2200, 5240, 1234567, 12, -3.5, 7]
+    assert parsed.iloc[6:].isna().all()
+
+
+def test_apply_schema_reports_fractional_and_bad_ints():
+    raw = pd.DataFrame({
+        'daerah': ['sabang', 'langsa', 'aceh besar', 'aceh barat'],
+        'jumlah_sma': ['3', '22.5', None, 'abc'],
+        'penduduk': ['2.2', '5.24', '1,5', '12'],
+    }, dtype=str)
+    df, issues = normalize.apply_schema(raw, {'daerah': 'category', 'jumlah_sma': 'int', 'penduduk': 'id_int'})
+
+    assert df['jumlah_sma'].dtype == 'Int64'
+    assert df['jumlah_sma'].tolist()[0] == 3
+    assert df['jumlah_sma'].iloc[1:].isna().all()
+    assert df['penduduk'].tolist()[:2] == [2200, 5240]
+    assert pd.isna(df['penduduk'].iloc[2])
+    # Empty cells are missing data, not issues
+    assert sorted(zip(issues['column'], issues['row'], issues['value'])) == [
+        ('jumlah_sma', 1, '22.5'), ('jumlah_sma', 3, 'abc'), ('penduduk', 2, '1,5')]
+
+
+def test_melt_years():
+    wide = pd.DataFrame({'daerah': ['sabang', 'langsa'], 'hls_2020': [14.1, 14.5], 'hls_2021': [14.2, 14.6]})
+    long = normalize.melt_years(wide)
+    assert normalize.wide_columns(wide.columns) == ['hls_2020', 'hls_2021']
+    assert list(long.columns) == ['daerah', 'value', 'metric', 'year']
+    assert long.sort_values(['daerah', 'year'])['year'].tolist() == [2020, 2021, 2020, 2021]
+    assert set(long['metric']) == {'hls'}